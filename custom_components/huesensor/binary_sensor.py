@@ -1,30 +1,88 @@
 """Binary sensor for Hue motion sensors."""
 import logging
 
-from homeassistant.components.binary_sensor import BinarySensorDevice
-from homeassistant.components.sensor import PLATFORM_SCHEMA  # noqa: F401
-from homeassistant.const import CONF_SCAN_INTERVAL, STATE_ON
+import homeassistant.helpers.config_validation as cv
+import homeassistant.util.dt as dt_util
+import voluptuous as vol
+from homeassistant.components.binary_sensor import (
+    DEVICE_CLASS_OCCUPANCY,
+    BinarySensorDevice,
+)
+from homeassistant.components.sensor import PLATFORM_SCHEMA
+from homeassistant.const import ATTR_ENTITY_ID, CONF_SCAN_INTERVAL, STATE_ON
 
-from . import DOMAIN
-from .data_manager import DEFAULT_SCAN_INTERVAL, HueSensorBaseDevice, HueSensorData
-from .hue_api_response import BINARY_SENSOR_MODELS
+from .data_manager import (
+    CONF_MIN_INTERVAL,
+    DEFAULT_SCAN_INTERVAL,
+    HueSensorBaseDevice,
+    async_get_data_manager,
+)
+from .hue_api_response import BINARY_SENSOR_MODELS, TELEMETRY_ATTRS
+from .occupancy import OccupancyGroup
 
 _LOGGER = logging.getLogger(__name__)
 
 TYPE_GEOFENCE = "Geofence"
 DEVICE_CLASSES = {"SML": "motion"}
+ATTR_LAST_MOTION = "last_motion"
+
+CONF_EVENT_STREAM = "event_stream"
+CONF_MAX_SCAN_INTERVAL = "max_scan_interval"
+CONF_MIN_WRITE_INTERVAL = "min_write_interval"
+CONF_DIRECT_CLIENT = "direct_client"
+CONF_MISSED_MOTION_HOLD = "missed_motion_hold"
+CONF_DEADBAND = "deadband"
+CONF_UNAVAILABLE_AFTER = "unavailable_after"
+CONF_EVICT_AFTER = "evict_after"
+CONF_GROUPS = "groups"
+
+DEADBAND_SCHEMA = vol.Schema(
+    {
+        vol.Optional("lx"): vol.All(vol.Coerce(float), vol.Range(min=0)),
+        vol.Optional("temperature"): vol.All(vol.Coerce(float), vol.Range(min=0)),
+        vol.Optional(CONF_MIN_INTERVAL): cv.time_period,
+    }
+)
+
+PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
+    {
+        vol.Optional(CONF_EVENT_STREAM, default=False): cv.boolean,
+        vol.Optional(CONF_MAX_SCAN_INTERVAL): cv.time_period,
+        vol.Optional(CONF_MIN_WRITE_INTERVAL): cv.time_period,
+        vol.Optional(CONF_DIRECT_CLIENT, default=False): cv.boolean,
+        vol.Optional(CONF_MISSED_MOTION_HOLD): cv.time_period,
+        vol.Optional(CONF_DEADBAND): DEADBAND_SCHEMA,
+        vol.Optional(CONF_UNAVAILABLE_AFTER): cv.time_period,
+        vol.Optional(CONF_EVICT_AFTER): cv.time_period,
+        vol.Optional(CONF_GROUPS): vol.Schema({cv.slug: cv.entity_ids}),
+    }
+)
 
 
 async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
     """Initialise Hue Bridge connection."""
-    if DOMAIN not in hass.data:
-        hass.data[DOMAIN] = HueSensorData(hass)
-
-    await hass.data[DOMAIN].async_add_platform_entities(
+    data_manager = async_get_data_manager(hass)
+    groups = config.get(CONF_GROUPS, {})
+    if groups:
+        async_add_entities(
+            [
+                HueOccupancyGroup(data_manager.add_group(name, entity_ids))
+                for name, entity_ids in groups.items()
+            ]
+        )
+    await data_manager.async_add_platform_entities(
         HueBinarySensor,
         BINARY_SENSOR_MODELS,
         async_add_entities,
         config.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL),
+        config.get(CONF_EVENT_STREAM, False),
+        config.get(CONF_MAX_SCAN_INTERVAL),
+        config.get(CONF_MIN_WRITE_INTERVAL),
+        config.get(CONF_DIRECT_CLIENT, False),
+        config.get(CONF_MISSED_MOTION_HOLD),
+        config.get(CONF_DEADBAND),
+        config.get(CONF_UNAVAILABLE_AFTER),
+        config.get(CONF_EVICT_AFTER),
     )
 
 
@@ -35,11 +93,71 @@ class HueBinarySensor(HueSensorBaseDevice, BinarySensorDevice):
     def is_on(self):
         """Return the state of the sensor."""
         data = self.sensor_data
-        if data and data["model"] == "SML" and data["changed"]:
-            return data["state"] == STATE_ON
+        if data and data.model == "SML" and data.changed:
+            return data.state == STATE_ON
         return False
 
     @property
     def device_class(self):
         """Return the class of this device, from component DEVICE_CLASSES."""
-        return DEVICE_CLASSES.get(self.sensor_data["model"])
+        return DEVICE_CLASSES.get(self.sensor_data.model)
+
+    def _build_attributes(self, data):
+        """Build the state attributes, with the time of the last motion."""
+        attributes = super()._build_attributes(data)
+        if self._data_manager.split_telemetry:
+            # shown in their own sensor entities
+            for key in TELEMETRY_ATTRS:
+                attributes.pop(key, None)
+        history = self._data_manager.motion_history.get(self.unique_id)
+        if history is not None and history.last_motion is not None:
+            attributes[ATTR_LAST_MOTION] = dt_util.utc_from_timestamp(
+                history.last_motion
+            ).isoformat()
+        return attributes
+
+
+class HueOccupancyGroup(BinarySensorDevice):
+    """Occupancy of a group of motion sensors, on while any of them is on."""
+
+    def __init__(self, group: OccupancyGroup):
+        """Initialize the group sensor."""
+        self._group = group
+
+    async def async_added_to_hass(self):
+        """Start writing the state when the group occupancy flips."""
+        self._group.entity = self
+
+    async def async_will_remove_from_hass(self):
+        """Stop writing the group state."""
+        self._group.entity = None
+
+    @property
+    def should_poll(self):
+        """No polling needed."""
+        return False
+
+    @property
+    def unique_id(self):
+        """Return the ID of the group."""
+        return f"huesensor_group_{self._group.name}"
+
+    @property
+    def name(self):
+        """Return the name of the group."""
+        return self._group.name.replace("_", " ").capitalize()
+
+    @property
+    def device_class(self):
+        """Return the class of the group."""
+        return DEVICE_CLASS_OCCUPANCY
+
+    @property
+    def is_on(self):
+        """Return True if any member of the group detects motion."""
+        return self._group.occupied
+
+    @property
+    def device_state_attributes(self):
+        """Return the members of the group."""
+        return {ATTR_ENTITY_ID: sorted(self._group.entity_ids)}
@@ -0,0 +1,67 @@
+"""Direct client of the sensors resources of a Hue bridge."""
+import json
+import logging
+from time import monotonic
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+_LOGGER = logging.getLogger(__name__)
+
+SENSORS_URL = "http://{host}/api/{username}/sensors"
+
+
+class BridgeClientError(Exception):
+    """Error response of the bridge."""
+
+
+class HueSensorsClient:
+    """
+    Minimal client fetching only the `/sensors` resources of a bridge (API v1).
+
+    Requests go through a shared session, so the connection to the bridge is
+    kept alive between polls, and the raw data of the last response is kept
+    in `sensors` (sensor id -> raw sensor data).
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, host: str, username: str):
+        """Initialize the client."""
+        self._session = session
+        self._url = SENSORS_URL.format(host=host, username=username)
+        self.sensors: Dict[str, Dict[str, Any]] = {}
+        self.last_refresh: Optional[float] = None
+
+    @property
+    def data_age(self) -> Optional[float]:
+        """Return the age in seconds of the sensors data, if refreshed."""
+        if self.last_refresh is None:
+            return None
+        return monotonic() - self.last_refresh
+
+    async def async_refresh(self, timeout: float):
+        """
+        Fetch the sensors resources of the bridge.
+
+        Raises `asyncio.TimeoutError`, `aiohttp.ClientError` or
+        `BridgeClientError` if the data can't be fetched.
+        """
+        async with self._session.get(
+            self._url, timeout=aiohttp.ClientTimeout(total=timeout)
+        ) as response:
+            response.raise_for_status()
+            # decode the body as is, without charset detection
+            try:
+                data = json.loads(await response.read())
+            except ValueError as exc:
+                raise BridgeClientError(f"invalid response: {exc}") from exc
+
+        if not isinstance(data, dict):
+            # API v1 errors are lists of {"error": {...}} objects
+            try:
+                description = data[0]["error"]["description"]
+            except (IndexError, KeyError, TypeError):
+                description = "unexpected response"
+            raise BridgeClientError(description)
+
+        self.sensors = data
+        self.last_refresh = monotonic()
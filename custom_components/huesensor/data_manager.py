@@ -1,22 +1,114 @@
 """The huesensors component."""
 import asyncio
 import logging
+from contextlib import nullcontext
 from datetime import timedelta
-from typing import AsyncIterable, Set, Tuple
+from functools import partial
+from time import monotonic, perf_counter, time
+from typing import AsyncIterable, Iterable, Iterator, List, Optional, Set, Tuple
 
+import aiohttp
+import homeassistant.helpers.config_validation as cv
+import homeassistant.util.dt as dt_util
+import voluptuous as vol
 from homeassistant.components.hue import DOMAIN as HUE_DOMAIN
 from homeassistant.components.hue import HueBridge
+from homeassistant.const import ATTR_ENTITY_ID, STATE_OFF, STATE_ON
+from homeassistant.core import callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.helpers.entity import Entity
-from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
 
-from .hue_api_response import BINARY_SENSOR_MODELS, ENTITY_ATTRS, parse_hue_api_response
+from . import DOMAIN
+from .bridge_client import BridgeClientError, HueSensorsClient
+from .deadband import DEADBAND_FIELDS, DeadbandFilter
+from .event_stream import EVENT_STREAM_URL, HueEventStream, update_raw_from_event
+from .hue_api_response import (
+    BINARY_SENSOR_MODELS,
+    ENTITY_ATTRS,
+    SENSOR_RECORDS,
+    SMLState,
+    get_device_id,
+    parse_sml,
+    raw_fingerprint,
+)
+from .metrics import DataManagerMetrics
+from .motion_history import MotionHistory, bridge_timestamp
+from .occupancy import OccupancyGroup
+from .profiler import TickProfiler
+from .refresh_broker import DATA_REFRESH_BROKERS, async_get_refresh_broker
+from .scheduler import AdaptivePollBackoff, TickScheduler
+from .telemetry_store import TelemetryStore
 
 _LOGGER = logging.getLogger(__name__)
 
-# Scan interval for binary sensors is set to < 1s
-# just to ~ensure that an update is called for each HA tick,
-# as using an exact 1s misses some of the ticks
+# Scan interval for binary sensors, ticks are scheduled by `TickScheduler`
+# on the event loop clock, so sub-second intervals are precise
 DEFAULT_SCAN_INTERVAL = timedelta(seconds=0.5)
+# Full refresh of bridges that are pushing changes through the event stream
+DEFAULT_RESYNC_INTERVAL = timedelta(minutes=1)
+# Max time (in seconds) to wait for each bridge to refresh its data
+BRIDGE_REFRESH_TIMEOUT = 2
+# Time a replayed motion pulse, missed between updates, is kept on
+DEFAULT_MISSED_MOTION_HOLD = timedelta(seconds=1)
+
+# Option of the deadband filter for the minimum interval between changes
+CONF_MIN_INTERVAL = "min_interval"
+
+# Resource types of the SML devices parsed by each kind of entity
+MOTION_RESOURCE_TYPES = ("ZLLPresence",)
+TELEMETRY_RESOURCE_TYPES = ("ZLLLightLevel", "ZLLTemperature")
+
+# Snapshot of the sensors data, restored at startup
+SNAPSHOT_STORAGE_KEY = f"{DOMAIN}.snapshot"
+SNAPSHOT_STORAGE_VERSION = 1
+SNAPSHOT_SAVE_DELAY = 60
+# Motion fields that are only valid while polling, so they are not restored
+SNAPSHOT_TRANSIENT_FIELDS = ("state", "changed")
+
+# Delay in seconds to retry the discovery of a bridge that failed to respond
+DISCOVERY_RETRY_DELAY = 30
+
+# Devices missing from the bridges are shown as unavailable after a grace
+# period, and removed later, checking them every `EXPIRY_CHECK_INTERVAL` s
+DEFAULT_UNAVAILABLE_AFTER = timedelta(minutes=5)
+DEFAULT_EVICT_AFTER = timedelta(days=1)
+EXPIRY_CHECK_INTERVAL = 30
+
+SERVICE_GET_METRICS = "get_metrics"
+EVENT_METRICS = f"{DOMAIN}_metrics"
+SERVICE_QUERY_MOTION_HISTORY = "query_motion_history"
+EVENT_MOTION_HISTORY = f"{DOMAIN}_motion_history"
+SERVICE_PROFILE = "profile"
+EVENT_PROFILE = f"{DOMAIN}_profile"
+ATTR_TICKS = "ticks"
+ATTR_SECONDS = "seconds"
+SERVICE_QUERY_TELEMETRY = "query_telemetry"
+EVENT_TELEMETRY = f"{DOMAIN}_telemetry"
+ATTR_MINUTES = "minutes"
+
+QUERY_MOTION_HISTORY_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_ENTITY_ID): cv.entity_ids,
+        vol.Optional(ATTR_MINUTES, default=60): cv.positive_int,
+    }
+)
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_TICKS, default=20): cv.positive_int,
+        vol.Optional(ATTR_SECONDS): vol.All(vol.Coerce(float), vol.Range(min=0.1)),
+    }
+)
+
+QUERY_TELEMETRY_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_ENTITY_ID): cv.entity_ids,
+        vol.Optional(ATTR_MINUTES, default=10): cv.positive_int,
+    }
+)
 
 
 async def async_get_bridges(hass) -> AsyncIterable[HueBridge]:
@@ -26,6 +118,22 @@ async def async_get_bridges(hass) -> AsyncIterable[HueBridge]:
             yield entry
 
 
+def _index_entry(raw: dict) -> Optional[Tuple[str, str, str]]:
+    """Return the device id, model and type of a supported sensor resource."""
+    model = raw["modelid"][0:3]
+    if model not in BINARY_SENSOR_MODELS:
+        return None
+    return get_device_id(raw), model, raw["type"]
+
+
+def async_get_data_manager(hass) -> "HueSensorData":
+    """Return the data manager shared by all platforms, creating it if needed."""
+    if DOMAIN not in hass.data:
+        hass.data[DOMAIN] = HueSensorData(hass)
+        hass.data[DOMAIN].async_register_services()
+    return hass.data[DOMAIN]
+
+
 class HueSensorData:
     """Sensor data handler for this custom integration."""
 
@@ -34,47 +142,522 @@ class HueSensorData:
         self.hass = hass
         self.lock = asyncio.Lock()
         self.data = {}
+        self._fingerprints = {}
+        # bridge host -> {sensor id: (uniqueid, (dev_id, model, type) or None)}
+        self._resource_index = {}
         self.sensors = {}
         self.registered_entities = {}
         self.available = False
         self._scan_interval = None
-        self._update_listener = None
+        self._tick_scheduler: Optional[TickScheduler] = None
+
+        # optional activity-driven backoff of bridge polling
+        self._max_scan_interval = None
+        self._poll_backoffs = {}
+
+        # optional push updates from the bridges event stream
+        self.use_event_stream = False
+        self._event_streams = {}
+
+        # optional deadband filtering of light level and temperature changes
+        self._deadband: Optional[DeadbandFilter] = None
+
+        # optional split of light level and temperature in sensor entities,
+        # updated apart from the motion data
+        self._split_telemetry = False
+
+        # optional direct polling of the sensors of the bridges
+        self.use_direct_client = False
+        self._bridge_clients = {}
+
+        # state writes are batched at the end of each update, with optional
+        # throttling of the writes that don't change the entity state
+        self._min_write_interval: Optional[float] = None
+        self._pending_writes: Set[str] = set()
+        self._last_writes = {}
+
+        self.metrics = DataManagerMetrics()
+        # on-demand profiling of the next update ticks
+        self._profiler: Optional[TickProfiler] = None
+        self.motion_history = {}
+        self.telemetry = TelemetryStore()
+
+        # replay of motion pulses that happened between updates:
+        # dev_id -> (last_updated of the pulse, timer handle to turn it off)
+        self._missed_motion_hold = DEFAULT_MISSED_MOTION_HOLD.total_seconds()
+        self._missed_pulses = {}
+
+        # snapshot of the sensors data, to restore the entities at startup
+        self._store = Store(hass, SNAPSHOT_STORAGE_VERSION, SNAPSHOT_STORAGE_KEY)
+        self._snapshot: Optional[dict] = None
+        self._snapshot_save_pending = False
+        # restored devices, reconciled with the bridge data in their 1st update
+        self._restored: Set[str] = set()
+
+        # lifecycle of devices missing from the bridges:
+        # dev_id -> monotonic time when it was last seen in the bridge data
+        self._last_seen = {}
+        self.unavailable_devices: Set[str] = set()
+        self._unavailable_after = DEFAULT_UNAVAILABLE_AFTER.total_seconds()
+        self._evict_after = DEFAULT_EVICT_AFTER.total_seconds()
+        self._next_expiry_check = 0.0
+        # set while evicted entities are removed, to keep polling the bridges
+        self._evicting = False
+
+        # occupancy groups, updated with the state writes of their members
+        self.groups = {}
+        self._member_groups = {}
 
         # delayed setup and discovery with platform + model filter
         self._registered_models: Set[str] = set()
         self._registered_platforms = {}
 
-    async def _iter_data(
-        self, models_filter: Tuple[str] = BINARY_SENSOR_MODELS
-    ) -> AsyncIterable[Tuple[bool, str, str, dict]]:
-        async for bridge in async_get_bridges(self.hass):
-            await bridge.sensor_manager.coordinator.async_request_refresh()
-            data = parse_hue_api_response(
-                sensor.raw
-                for sensor in bridge.api.sensors.values()
-                if sensor.raw["modelid"].startswith(models_filter)
+    def _bridge_needs_refresh(self, bridge: HueBridge) -> bool:
+        """Return False if bridge is streaming its changes and resync is not due."""
+        stream = self._event_streams.get(bridge.host)
+        if stream is not None and stream.streaming:
+            data_age = self._get_data_age(bridge)
+            return (
+                data_age is None or data_age >= DEFAULT_RESYNC_INTERVAL.total_seconds()
             )
-            for dev_id, dev_data in data.items():
+        backoff = self._get_poll_backoff(bridge)
+        return backoff is None or backoff.is_due()
+
+    def _get_poll_backoff(self, bridge: HueBridge) -> Optional[AdaptivePollBackoff]:
+        """Return the polling backoff of a bridge, if adaptive polling is enabled."""
+        if self._max_scan_interval is None or self._scan_interval is None:
+            return None
+        backoff = self._poll_backoffs.get(bridge.host)
+        if backoff is None:
+            backoff = self._poll_backoffs[bridge.host] = AdaptivePollBackoff(
+                self._scan_interval, self._max_scan_interval
+            )
+        return backoff
+
+    def _get_bridge_client(self, bridge: HueBridge) -> Optional[HueSensorsClient]:
+        """Return the direct sensors client of a bridge, if enabled."""
+        if not self.use_direct_client:
+            return None
+        client = self._bridge_clients.get(bridge.host)
+        if client is None:
+            client = self._bridge_clients[bridge.host] = HueSensorsClient(
+                async_get_clientsession(self.hass),
+                bridge.host,
+                bridge.api.username,
+            )
+        return client
+
+    def _iter_bridge_resources(self, bridge: HueBridge) -> Iterator[Tuple[str, dict]]:
+        """Iterate over the id and raw data of the sensors of a bridge."""
+        client = self._bridge_clients.get(bridge.host)
+        if client is not None:
+            return iter(client.sensors.items())
+        return ((sensor.id, sensor.raw) for sensor in bridge.api.sensors.values())
+
+    def _get_raw_resource(self, bridge: HueBridge, sensor_id: str) -> Optional[dict]:
+        """Return the raw data of a sensor of a bridge, if it exists."""
+        client = self._bridge_clients.get(bridge.host)
+        if client is not None:
+            return client.sensors.get(sensor_id)
+        try:
+            return bridge.api.sensors[sensor_id].raw
+        except KeyError:
+            return None
+
+    def _get_data_age(self, bridge: HueBridge) -> Optional[float]:
+        """Return the age in seconds of the sensors data of a bridge."""
+        client = self._bridge_clients.get(bridge.host)
+        if client is not None:
+            return client.data_age
+        return async_get_refresh_broker(self.hass, bridge).data_age
+
+    async def _async_refresh_bridge(self, bridge: HueBridge) -> bool:
+        """Request fresh data from a bridge, returning False on errors."""
+        start = perf_counter()
+        client = self._get_bridge_client(bridge)
+        try:
+            if client is not None:
+                await client.async_refresh(BRIDGE_REFRESH_TIMEOUT)
+            else:
+                await asyncio.wait_for(
+                    async_get_refresh_broker(self.hass, bridge).async_refresh(),
+                    BRIDGE_REFRESH_TIMEOUT,
+                )
+        except asyncio.TimeoutError:
+            _LOGGER.warning("Timeout updating data from bridge %s", bridge.host)
+            self.metrics.record_timeout(bridge.host)
+            return False
+        except (aiohttp.ClientError, BridgeClientError) as exc:
+            _LOGGER.warning("Error updating data from bridge %s: %s", bridge.host, exc)
+            return False
+        self.metrics.record_refresh(bridge.host, perf_counter() - start)
+        return True
+
+    def _iter_bridges_data(
+        self,
+        bridges: Iterable[HueBridge],
+        models_filter: Tuple[str] = BINARY_SENSOR_MODELS,
+        resource_types: Optional[Tuple[str]] = None,
+    ) -> Iterator[Tuple[bool, str, str, SMLState]]:
+        """
+        Parse raw data of bridges that changed and compare with stored data.
+
+        If `resource_types` is given, only resources of those types are parsed.
+        """
+        presence = resource_types is None or "ZLLPresence" in resource_types
+        start = perf_counter()
+        now = monotonic()
+        last_seen, unavailable = self._last_seen, self.unavailable_devices
+        changed_devices = {}
+        for bridge in bridges:
+            index = self._resource_index.setdefault(bridge.host, {})
+            active = False
+            num_resources = 0
+            for sensor_id, raw in self._iter_bridge_resources(bridge):
+                num_resources += 1
+                indexed = index.get(sensor_id)
+                if indexed is None or indexed[0] != raw.get("uniqueid"):
+                    # new resource, or a sensor id reused by the bridge
+                    indexed = index[sensor_id] = (
+                        raw.get("uniqueid"),
+                        _index_entry(raw),
+                    )
+                entry = indexed[1]
+                if entry is None or entry[1] not in models_filter:
+                    continue
+                last_seen[entry[0]] = now
+                if entry[0] in unavailable:
+                    # back in the bridge data before its eviction
+                    unavailable.discard(entry[0])
+                    self._pending_writes.add(entry[0])
+                if resource_types is not None and entry[2] not in resource_types:
+                    continue
+                fingerprint = raw_fingerprint(raw)
+                is_changed = self._fingerprints.get(raw["uniqueid"]) != fingerprint
+                if is_changed:
+                    self._fingerprints[raw["uniqueid"]] = fingerprint
+                    changed_devices.setdefault(entry[0], (entry[1], []))[1].append(raw)
+                if entry[2] == "ZLLPresence" and (
+                    is_changed or raw["state"]["presence"]
+                ):
+                    active = True
+
+            backoff = self._get_poll_backoff(bridge)
+            if backoff is not None and presence:
+                backoff.record_poll(active)
+
+            if len(index) > num_resources:
+                # resources removed from the bridge
+                current = {
+                    sensor_id for sensor_id, _ in self._iter_bridge_resources(bridge)
+                }
+                for sensor_id in index.keys() - current:
+                    index.pop(sensor_id)
+
+        # only changed resources are parsed, in place over the device records
+        parse_time = perf_counter() - start
+        num_updated = 0
+        deadband = self._deadband
+        for dev_id, (dev_model, raw_resources) in changed_devices.items():
+            start = perf_counter()
+            record = self.data.get(dev_id)
+            is_new = record is None
+            # without motion data of the restored devices to compare with
+            reconcile = dev_id in self._restored
+            if is_new:
+                record = self.data[dev_id] = SENSOR_RECORDS[dev_model]()
+            last_updated, state = record.last_updated, record.state
+            generation = record.generation
+            telemetry = False
+            for raw in raw_resources:
+                if raw["type"] not in TELEMETRY_RESOURCE_TYPES:
+                    parse_sml(raw, record)
+                    continue
+                telemetry = True
+                if deadband is not None:
+                    parsed = parse_sml(raw)
+                    if deadband.apply(dev_id, record, parsed):
+                        # parse it again in the next update
+                        self._fingerprints.pop(raw["uniqueid"], None)
+                    for key, value in parsed.items():
+                        record[key] = value
+                else:
+                    parse_sml(raw, record)
+            if telemetry:
+                self.telemetry.record(dev_id, record)
+            motion = dev_model == "SML" and presence
+            if motion:
+                self._restored.discard(dev_id)
+                record["changed"] = True
+                if not is_new and not reconcile:
+                    self._replay_missed_pulse(dev_id, record, last_updated, state)
+
+            # changes of fields not shown by the entity don't need a write
+            updated = is_new or record.generation != generation
+            if (
+                presence
+                and updated
+                and not is_new
+                and record.last_updated == last_updated
+                and record.state == state
+            ):
+                if motion:
+                    record.changed = False
                 updated = False
-                dev_model = dev_data["model"]
-                if dev_model == "SML":
-                    dev_data["changed"] = True
-                old = self.data.get(dev_id)
-                if not old:
-                    updated = True
-                    self.data[dev_id] = dev_data
-                elif old != dev_data:
-                    updated = True
-                    if (
-                        old["last_updated"] == dev_data["last_updated"]
-                        and old["state"] == dev_data["state"]
-                    ):
-                        if dev_model == "SML":
-                            dev_data["changed"] = False
-                        updated = False
-                    self.data[dev_id].update(dev_data)
-
-                yield updated, dev_data["model"], dev_id, dev_data
+
+            if motion and not reconcile and record.state != state:
+                if not is_new or record.state == STATE_ON:
+                    self._record_motion_transition(dev_id, record)
+
+            parse_time += perf_counter() - start
+            num_updated += updated
+            yield updated, dev_model, dev_id, record
+
+        self.metrics.parse_time.add(parse_time)
+        self.metrics.devices_changed.add(num_updated)
+        if num_updated:
+            self._schedule_snapshot_save()
+
+    def _schedule_snapshot_save(self):
+        """Schedule a save of the sensors data snapshot, if not scheduled yet."""
+        if not self._snapshot_save_pending:
+            self._snapshot_save_pending = True
+            self._store.async_delay_save(self._snapshot_data, SNAPSHOT_SAVE_DELAY)
+
+    def _snapshot_data(self) -> dict:
+        """Return the data of the registered devices to store."""
+        self._snapshot_save_pending = False
+        return {
+            "devices": {
+                dev_id: {
+                    field: value
+                    for field, value in record.as_dict().items()
+                    if field not in SNAPSHOT_TRANSIENT_FIELDS
+                }
+                for dev_id, record in self.data.items()
+                if dev_id in self.registered_entities
+            }
+        }
+
+    async def _async_restore_snapshot(
+        self, platform_models: Tuple[str], new_entities_to_add
+    ) -> bool:
+        """Register the stored devices of the platform models, if any."""
+        if self._snapshot is None:
+            try:
+                self._snapshot = await self._store.async_load() or {}
+            except HomeAssistantError as exc:
+                _LOGGER.warning("Can't restore the stored sensors data: %s", exc)
+                self._snapshot = {}
+
+        restored = False
+        for dev_id, fields in self._snapshot.get("devices", {}).items():
+            model = fields.get("model")
+            if (
+                model not in platform_models
+                or dev_id in self.data
+                or dev_id in self.registered_entities
+            ):
+                continue
+            self.data[dev_id] = SENSOR_RECORDS[model].from_dict(
+                {
+                    field: value
+                    for field, value in fields.items()
+                    if field not in SNAPSHOT_TRANSIENT_FIELDS
+                }
+            )
+            self._restored.add(dev_id)
+            self._last_seen[dev_id] = monotonic()
+            self._register_new_entity(dev_id, model, new_entities_to_add)
+            restored = True
+        return restored
+
+    async def _async_expire_devices(self):
+        """
+        Mark devices missing from the bridges as unavailable, or evict them.
+
+        Evicted devices lose their data and entity, and are discovered as new
+        devices if they come back. State of removed bridges is dropped too.
+        """
+        now = monotonic()
+        if now < self._next_expiry_check:
+            return
+        self._next_expiry_check = now + EXPIRY_CHECK_INTERVAL
+
+        expired = [
+            (dev_id, now - seen)
+            for dev_id, seen in self._last_seen.items()
+            if now - seen >= self._unavailable_after
+        ]
+        for dev_id, missing in expired:
+            if missing >= self._evict_after:
+                _LOGGER.warning("Removing device %s, missing for %d s", dev_id, missing)
+                entity = self.sensors.get(dev_id)
+                if entity is not None:
+                    self._evicting = True
+                    try:
+                        await entity.async_remove()
+                    finally:
+                        self._evicting = False
+                self.registered_entities.pop(dev_id, None)
+                self._forget_device(dev_id)
+            elif dev_id not in self.unavailable_devices:
+                _LOGGER.info(
+                    "Device %s is unavailable, missing for %d s", dev_id, missing
+                )
+                self.unavailable_devices.add(dev_id)
+                self._pending_writes.add(dev_id)
+
+        await self._async_forget_removed_bridges()
+
+    def _forget_device(self, dev_id: str):
+        """Drop all the data kept for a device."""
+        self.data.pop(dev_id, None)
+        self._restored.discard(dev_id)
+        self._last_seen.pop(dev_id, None)
+        self.unavailable_devices.discard(dev_id)
+        self.motion_history.pop(dev_id, None)
+        self.telemetry.forget(dev_id)
+        self._last_writes.pop(dev_id, None)
+        self._pending_writes.discard(dev_id)
+        if self._deadband is not None:
+            self._deadband.forget(dev_id)
+        pulse = self._missed_pulses.pop(dev_id, None)
+        if pulse is not None:
+            pulse[1].cancel()
+        # resources of a device share its unique id, but for the last 5 chars
+        device_uniqueid = dev_id[4:]
+        for uniqueid in [
+            uniqueid
+            for uniqueid in self._fingerprints
+            if uniqueid[:-5] == device_uniqueid
+        ]:
+            del self._fingerprints[uniqueid]
+
+    async def _async_forget_removed_bridges(self):
+        """Drop the state kept for bridges removed from the Hue integration."""
+        hosts = {bridge.host async for bridge in async_get_bridges(self.hass)}
+        brokers = self.hass.data.get(DATA_REFRESH_BROKERS, {})
+        for host in (
+            self._resource_index.keys() | self._event_streams.keys() | brokers.keys()
+        ) - hosts:
+            _LOGGER.info("Bridge %s was removed, dropping its state", host)
+            self._resource_index.pop(host, None)
+            self._poll_backoffs.pop(host, None)
+            self._bridge_clients.pop(host, None)
+            brokers.pop(host, None)
+            stream = self._event_streams.pop(host, None)
+            if stream is not None:
+                await stream.async_stop()
+
+    def _replay_missed_pulse(self, dev_id, record, last_updated, state):
+        """
+        Turn on a motion sensor whose presence went on and off between updates.
+
+        The bridge only shows that as a newer `last_updated` with no presence,
+        so the missed pulse is replayed, turning the sensor off after a hold.
+        """
+        pulse = self._missed_pulses.get(dev_id)
+        if pulse is not None:
+            if record.last_updated == pulse[0]:
+                # no new presence data, keep the pulse on during the hold
+                record["state"] = STATE_ON
+                return
+            pulse[1].cancel()
+            del self._missed_pulses[dev_id]
+            state = STATE_OFF
+
+        if (
+            state == STATE_OFF
+            and record.state == STATE_OFF
+            and last_updated is not None
+            and record.last_updated != last_updated
+        ):
+            record["state"] = STATE_ON
+            self._missed_pulses[dev_id] = (
+                record.last_updated,
+                self.hass.loop.call_later(
+                    self._missed_motion_hold, self._async_end_missed_pulse, dev_id
+                ),
+            )
+            self.metrics.missed_pulses += 1
+
+    @callback
+    def _async_end_missed_pulse(self, dev_id: str):
+        """Turn off a sensor at the end of a replayed motion pulse."""
+        self._missed_pulses.pop(dev_id, None)
+        record = self.data.get(dev_id)
+        if record is None or record.state != STATE_ON:
+            return
+        record["state"] = STATE_OFF
+        self._record_motion_transition(dev_id, record)
+        if dev_id in self.sensors:
+            self._pending_writes.add(dev_id)
+            self._flush_state_writes()
+
+    def _record_motion_transition(self, dev_id: str, record: SMLState):
+        """Store a motion on/off transition in the history of the device."""
+        history = self.motion_history.get(dev_id)
+        if history is None:
+            history = self.motion_history[dev_id] = MotionHistory()
+        history.record(bridge_timestamp(record.last_updated), record.state == STATE_ON)
+
+    @property
+    def split_telemetry(self) -> bool:
+        """Return True if light level and temperature have their own entities."""
+        return self._split_telemetry
+
+    @split_telemetry.setter
+    def split_telemetry(self, value: bool):
+        """Split light level and temperature from the motion entities, or not."""
+        if value == self._split_telemetry:
+            return
+        self._split_telemetry = value
+        # the attributes of the motion entities change, so they are rebuilt
+        for record in self.data.values():
+            record.generation += 1
+        self._pending_writes.update(self.sensors)
+
+    @property
+    def _motion_resource_types(self) -> Optional[Tuple[str]]:
+        """Return the resource types to parse in the updates of motion sensors."""
+        return MOTION_RESOURCE_TYPES if self.split_telemetry else None
+
+    async def async_iter_telemetry(
+        self, max_age: float
+    ) -> AsyncIterable[Tuple[bool, str, str, SMLState]]:
+        """Parse light level and temperature data no older than `max_age`."""
+        bridges = [bridge async for bridge in async_get_bridges(self.hass)]
+        stale = [
+            bridge
+            for bridge in bridges
+            if self._get_data_age(bridge) is None
+            or self._get_data_age(bridge) > max_age
+        ]
+        refreshed = await asyncio.gather(
+            *(self._async_refresh_bridge(bridge) for bridge in stale)
+        )
+        failed = {bridge.host for bridge, ok in zip(stale, refreshed) if not ok}
+        bridges = [bridge for bridge in bridges if bridge.host not in failed]
+
+        # without motion entities, all data of the devices is parsed here
+        resource_types = TELEMETRY_RESOURCE_TYPES if self._registered_models else None
+        for item in self._iter_bridges_data(
+            bridges, BINARY_SENSOR_MODELS, resource_types
+        ):
+            yield item
+
+    async def _async_refresh_due_bridges(self) -> List[HueBridge]:
+        """Refresh the bridges that need it, returning the refreshed ones."""
+        bridges = [
+            bridge
+            async for bridge in async_get_bridges(self.hass)
+            if self._bridge_needs_refresh(bridge)
+        ]
+        refreshed = await asyncio.gather(
+            *(self._async_refresh_bridge(bridge) for bridge in bridges)
+        )
+        return [bridge for bridge, ok in zip(bridges, refreshed) if ok]
 
     async def async_start_scheduler(self):
         """Schedule data polling with current scan_interval."""
@@ -82,30 +665,75 @@ class HueSensorData:
             if self.available:
                 return
 
-            if self._update_listener is not None:
-                _LOGGER.info(f"Cancelling old time tracker")
-                self._update_listener()
-            self._update_listener = async_track_time_interval(
+            if self._tick_scheduler is not None:
+                _LOGGER.info(f"Cancelling old tick scheduler")
+                self._tick_scheduler.stop()
+            self._tick_scheduler = TickScheduler(
                 self.hass,
-                self.async_update_from_bridges,
                 self._scan_interval,
+                self.async_update_from_bridges,
             )
+            self._tick_scheduler.start()
+            if self.use_event_stream:
+                await self._async_start_event_streams()
             self.available = True
 
     async def async_stop_scheduler(self):
         """Cancel data polling with current scan_interval."""
         async with self.lock:
-            if not self.available and self._update_listener is None:
+            if not self.available and self._tick_scheduler is None:
                 _LOGGER.debug(f"Already stopped")
                 return
 
-            if self._update_listener is not None:
-                self._update_listener()
-                self._update_listener = None
+            if self._tick_scheduler is not None:
+                self._tick_scheduler.stop()
+                self._tick_scheduler = None
+
+            for stream in self._event_streams.values():
+                await stream.async_stop()
+            self._event_streams.clear()
+
+            for _last_updated, handle in self._missed_pulses.values():
+                handle.cancel()
+            self._missed_pulses.clear()
 
             self.available = False
         _LOGGER.debug(f"Stopped polling with {self._scan_interval}")
 
+    async def _async_start_event_streams(self):
+        """Subscribe to the event stream of each bridge for push updates."""
+        session = async_get_clientsession(self.hass, verify_ssl=False)
+        async for bridge in async_get_bridges(self.hass):
+            if bridge.host in self._event_streams:
+                continue
+            stream = HueEventStream(
+                session,
+                EVENT_STREAM_URL.format(host=bridge.host),
+                bridge.api.username,
+                partial(self.async_update_from_event_stream, bridge),
+            )
+            self._event_streams[bridge.host] = stream
+            stream.start()
+            _LOGGER.debug("Listening to event stream of bridge %s", bridge.host)
+
+    async def async_update_from_event_stream(self, bridge: HueBridge, resources):
+        """Apply pushed resource changes from a bridge and update sensors data."""
+        changed = False
+        for resource in resources:
+            raw = self._get_raw_resource(bridge, resource["id_v1"][len("/sensors/") :])
+            if raw is not None:
+                changed |= update_raw_from_event(raw, resource)
+        if not changed:
+            return
+
+        new_entities_to_add = {}
+        for updated, model, dev_id, _dev_data in self._iter_bridges_data(
+            [bridge], tuple(self._registered_models), self._motion_resource_types
+        ):
+            self._process_device_update(updated, model, dev_id, new_entities_to_add)
+        self._flush_state_writes()
+        await self._add_new_entities(new_entities_to_add)
+
     def _register_new_entity(self, dev_id, model, new_entities_to_add):
         """Register a new Entity and add it in platform queue for HA setup."""
         # Create platform entity and register the device
@@ -140,46 +768,347 @@ class HueSensorData:
         platform_models,
         func_add_entities,
         scan_interval,
+        event_stream=False,
+        max_scan_interval=None,
+        min_write_interval=None,
+        direct_client=False,
+        missed_motion_hold=None,
+        deadband=None,
+        unavailable_after=None,
+        evict_after=None,
     ):
         """Add sensor entities from platform setups."""
+        if event_stream:
+            self.use_event_stream = True
+        if direct_client:
+            self.use_direct_client = True
+        if missed_motion_hold is not None:
+            self._missed_motion_hold = missed_motion_hold.total_seconds()
+        if deadband:
+            self._deadband = DeadbandFilter(
+                {key: deadband[key] for key in DEADBAND_FIELDS if key in deadband},
+                (
+                    deadband[CONF_MIN_INTERVAL].total_seconds()
+                    if CONF_MIN_INTERVAL in deadband
+                    else None
+                ),
+            )
+        if unavailable_after is not None:
+            self._unavailable_after = unavailable_after.total_seconds()
+        if evict_after is not None:
+            self._evict_after = evict_after.total_seconds()
+        if max_scan_interval is not None:
+            self._max_scan_interval = max_scan_interval
+        if min_write_interval is not None:
+            self._min_write_interval = min_write_interval.total_seconds()
+
         for model in platform_models:
             self._registered_platforms[model] = (entity_cls, func_add_entities)
             self._registered_models.add(model)
 
         new_entities_to_add = {}
-        async for is_new, model, dev_id, _ in self._iter_data(platform_models):
-            if is_new and dev_id not in self.registered_entities:
-                self._register_new_entity(dev_id, model, new_entities_to_add)
+        if await self._async_restore_snapshot(platform_models, new_entities_to_add):
+            await self._add_new_entities(new_entities_to_add, scan_interval)
 
-        await self._add_new_entities(new_entities_to_add, scan_interval)
+        # each bridge is discovered in background, adding its entities when
+        # it responds, so slow bridges don't delay the setup
+        async for bridge in async_get_bridges(self.hass):
+            self.hass.async_create_task(
+                self._async_discover_bridge(bridge, platform_models, scan_interval)
+            )
+
+    async def _async_discover_bridge(
+        self, bridge: HueBridge, platform_models, scan_interval
+    ):
+        """Refresh a bridge, adding its new devices and updating existing ones."""
+        if not await self._async_refresh_bridge(bridge):
+            _LOGGER.info(
+                "Retrying discovery of bridge %s in %d s",
+                bridge.host,
+                DISCOVERY_RETRY_DELAY,
+            )
+
+            @callback
+            def _retry(_now):
+                self.hass.async_create_task(
+                    self._async_retry_discovery(
+                        bridge.host, platform_models, scan_interval
+                    )
+                )
+
+            async_call_later(self.hass, DISCOVERY_RETRY_DELAY, _retry)
+            return
 
-    async def async_update_from_bridges(self, now=None):
-        """Request data from bridges and update sensors data."""
         new_entities_to_add = {}
-        async for updated, model, dev_id, _dev_data in self._iter_data(
-            tuple(self._registered_models)
+        for updated, model, dev_id, _ in self._iter_bridges_data(
+            [bridge], platform_models, self._motion_resource_types
         ):
             if updated and dev_id not in self.registered_entities:
-                # Discovery of newly added devices
-                _LOGGER.warning(
-                    "New device discovered %s:%s. Adding it now", model, dev_id
-                )
                 self._register_new_entity(dev_id, model, new_entities_to_add)
-            elif updated and dev_id not in self.sensors:
-                # device is registered, but it is not added to hass yet ¿?
-                _LOGGER.warning(
-                    "Device %s:%s registered but not added yet", model, dev_id
+            elif updated and dev_id in self.sensors:
+                self._pending_writes.add(dev_id)
+
+        # devices already parsed for other platforms, like the telemetry
+        # sensors, are unchanged for the fingerprints, but not registered yet
+        for _uniqueid, entry in self._resource_index.get(bridge.host, {}).values():
+            if (
+                entry is not None
+                and entry[1] in platform_models
+                and entry[0] in self.data
+                and entry[0] not in self.registered_entities
+            ):
+                self._register_new_entity(entry[0], entry[1], new_entities_to_add)
+
+        if self._pending_writes:
+            self._flush_state_writes()
+
+        await self._add_new_entities(new_entities_to_add, scan_interval)
+
+    async def _async_retry_discovery(self, host: str, platform_models, scan_interval):
+        """Retry the discovery of a bridge, if it is still needed."""
+        if self._tick_scheduler is not None:
+            # the regular updates discover the devices of all bridges
+            return
+        async for bridge in async_get_bridges(self.hass):
+            if bridge.host == host:
+                await self._async_discover_bridge(
+                    bridge, platform_models, scan_interval
                 )
-            elif updated:
-                self.sensors[dev_id].async_write_ha_state()
+                return
+        _LOGGER.info("Bridge %s was removed, stopping its discovery", host)
+
+    def _process_device_update(self, updated, model, dev_id, new_entities_to_add):
+        """Queue the state write of an updated device, or register new ones."""
+        if updated and dev_id not in self.registered_entities:
+            # Discovery of newly added devices
+            _LOGGER.warning("New device discovered %s:%s. Adding it now", model, dev_id)
+            self._register_new_entity(dev_id, model, new_entities_to_add)
+        elif updated and dev_id not in self.sensors:
+            # device is registered, but it is not added to hass yet ¿?
+            _LOGGER.warning("Device %s:%s registered but not added yet", model, dev_id)
+        elif updated:
+            self._pending_writes.add(dev_id)
+
+    def _flush_state_writes(self):
+        """
+        Write the state of all updated entities.
+
+        State transitions are always written. If a minimum write interval is
+        configured, writes that only change attributes are delayed until the
+        interval since the last write of the entity has passed.
+        """
+        if not self._pending_writes:
+            self.metrics.state_writes.add(0)
+            return
+
+        num_writes = 0
+        now = monotonic()
+        debug = _LOGGER.isEnabledFor(logging.DEBUG)
+        flipped_groups = set()
+        for dev_id in tuple(self._pending_writes):
+            entity = self.sensors.get(dev_id)
+            if entity is None:
+                self._pending_writes.discard(dev_id)
+                continue
+
+            if self._min_write_interval is not None:
+                state = entity.state
+                last_write = self._last_writes.get(dev_id)
+                if (
+                    last_write is not None
+                    and last_write[1] == state
+                    and now - last_write[0] < self._min_write_interval
+                ):
+                    continue
+                self._last_writes[dev_id] = (now, state)
+
+            self._pending_writes.discard(dev_id)
+            entity.async_write_ha_state()
+            num_writes += 1
+            for group in self._member_groups.get(dev_id, ()):
+                if group.set_member(dev_id, entity.available and entity.is_on):
+                    flipped_groups.add(group)
+            if debug:
                 _LOGGER.debug(
                     "%s (%s): updated with state=%s",
-                    self.sensors[dev_id].entity_id,
+                    entity.entity_id,
                     dev_id,
-                    self.sensors[dev_id].state,
+                    entity.state,
                 )
+        for group in flipped_groups:
+            self._write_group(group)
+        self.metrics.state_writes.add(num_writes)
+
+    def add_group(self, name: str, entity_ids) -> OccupancyGroup:
+        """Declare an occupancy group of motion sensors by their entity ids."""
+        group = self.groups[name] = OccupancyGroup(name, entity_ids)
+        for entity in self.sensors.values():
+            if entity.entity_id in group.entity_ids:
+                self._member_groups.setdefault(entity.unique_id, []).append(group)
+                group.set_member(entity.unique_id, entity.available and entity.is_on)
+        return group
+
+    def _join_groups(self, entity):
+        """Add an entity to the occupancy groups that declare it as member."""
+        for group in self.groups.values():
+            if entity.entity_id not in group.entity_ids:
+                continue
+            self._member_groups.setdefault(entity.unique_id, []).append(group)
+            if group.set_member(entity.unique_id, entity.available and entity.is_on):
+                self._write_group(group)
+
+    def _leave_groups(self, dev_id: str):
+        """Remove a device from its occupancy groups."""
+        for group in self._member_groups.pop(dev_id, ()):
+            if group.set_member(dev_id, False):
+                self._write_group(group)
+
+    @staticmethod
+    def _write_group(group: OccupancyGroup):
+        """Write the state of a group entity, if added to hass."""
+        if group.entity is not None and group.entity.hass is not None:
+            group.entity.async_write_ha_state()
+
+    def metrics_snapshot(self) -> dict:
+        """Return the summary of the performance metrics."""
+        snapshot = self.metrics.snapshot()
+        if self._tick_scheduler is not None:
+            snapshot["scheduler"] = self._tick_scheduler.stats
+        snapshot["telemetry_store_bytes"] = self.telemetry.nbytes
+        return snapshot
+
+    def async_register_services(self):
+        """Register the services of the integration."""
+        self.hass.services.async_register(
+            DOMAIN, SERVICE_GET_METRICS, self._async_handle_get_metrics
+        )
+        self.hass.services.async_register(
+            DOMAIN,
+            SERVICE_QUERY_MOTION_HISTORY,
+            self._async_handle_query_motion_history,
+            schema=QUERY_MOTION_HISTORY_SCHEMA,
+        )
+        self.hass.services.async_register(
+            DOMAIN,
+            SERVICE_QUERY_TELEMETRY,
+            self._async_handle_query_telemetry,
+            schema=QUERY_TELEMETRY_SCHEMA,
+        )
+        self.hass.services.async_register(
+            DOMAIN, SERVICE_PROFILE, self._async_handle_profile, schema=PROFILE_SCHEMA
+        )
+
+    def query_motion_history(self, dev_id: str, minutes: int) -> dict:
+        """Return motion count in the last minutes and time since last motion."""
+        history = self.motion_history.get(dev_id)
+        if history is None:
+            return {"motion_count": 0, "last_motion": None, "since_last_motion": None}
+        now = time()
+        last_motion = history.last_motion
+        return {
+            "motion_count": history.count_since(now - 60 * minutes),
+            "last_motion": (
+                dt_util.utc_from_timestamp(last_motion).isoformat()
+                if last_motion is not None
+                else None
+            ),
+            "since_last_motion": (
+                round(now - last_motion, 1) if last_motion is not None else None
+            ),
+        }
+
+    async def _async_handle_query_motion_history(self, call):
+        """Publish the motion history stats of the requested sensors in an event."""
+        minutes = call.data[ATTR_MINUTES]
+        results = {
+            entity.entity_id: self.query_motion_history(dev_id, minutes)
+            for dev_id, entity in self.sensors.items()
+            if entity.entity_id in call.data[ATTR_ENTITY_ID]
+        }
+        self.hass.bus.async_fire(
+            EVENT_MOTION_HISTORY, {ATTR_MINUTES: minutes, "sensors": results}
+        )
+
+    async def _async_handle_query_telemetry(self, call):
+        """Publish the light level and temperature stats of the sensors in an event."""
+        minutes = call.data[ATTR_MINUTES]
+        results = {
+            entity.entity_id: self.telemetry.summary(dev_id, minutes)
+            for dev_id, entity in self.sensors.items()
+            if entity.entity_id in call.data[ATTR_ENTITY_ID]
+        }
+        self.hass.bus.async_fire(
+            EVENT_TELEMETRY, {ATTR_MINUTES: minutes, "sensors": results}
+        )
+
+    async def _async_handle_profile(self, call):
+        """Start profiling the next update ticks."""
+        if self._profiler is not None:
+            _LOGGER.warning("A profile of the updates is already being captured")
+            return
+        profiler = TickProfiler(call.data[ATTR_TICKS], call.data.get(ATTR_SECONDS))
+        try:
+            profiler.check()
+        except ValueError as exc:
+            _LOGGER.error("Can't profile the updates: %s", exc)
+            return
+        self._profiler = profiler
+        _LOGGER.info("Profiling the next updates")
+
+    async def _async_save_profile(self, profiler: TickProfiler):
+        """Write a finished profile in the config dir, announcing it in an event."""
+        if not profiler.captured:
+            _LOGGER.warning("No update was profiled, another profiler was active")
+            return
+        path = self.hass.config.path(
+            f"{DOMAIN}_profile_{dt_util.utcnow().strftime('%Y%m%d_%H%M%S')}.prof"
+        )
+        try:
+            await self.hass.async_add_executor_job(profiler.save, path)
+        except OSError as exc:
+            _LOGGER.error("Can't write the profile of the updates: %s", exc)
+            return
+        _LOGGER.info("Profile of %d updates written to %s", profiler.ticks, path)
+        self.hass.bus.async_fire(
+            EVENT_PROFILE,
+            {ATTR_TICKS: profiler.ticks, "path": path, "report": f"{path}.txt"},
+        )
+
+    async def _async_handle_get_metrics(self, call):
+        """Publish a snapshot of the performance metrics in an event."""
+        snapshot = self.metrics_snapshot()
+        _LOGGER.info("Performance metrics: %s", snapshot)
+        self.hass.bus.async_fire(EVENT_METRICS, snapshot)
+
+    async def async_update_from_bridges(self, now=None):
+        """Request data from bridges and update sensors data."""
+        bridges = await self._async_refresh_due_bridges()
+
+        # only the parsing and the state writes are profiled, not the awaits
+        profiler = self._profiler
+        new_entities_to_add = {}
+        with self._profile():
+            for updated, model, dev_id, _dev_data in self._iter_bridges_data(
+                bridges, tuple(self._registered_models), self._motion_resource_types
+            ):
+                self._process_device_update(updated, model, dev_id, new_entities_to_add)
+        await self._async_expire_devices()
+        with self._profile():
+            self._flush_state_writes()
         await self._add_new_entities(new_entities_to_add)
 
+        if profiler is not None:
+            profiler.ticks += 1
+            if profiler.done:
+                self._profiler = None
+                await self._async_save_profile(profiler)
+
+    def _profile(self):
+        """Return a context profiling the code run in it, if capturing a profile."""
+        if self._profiler is None:
+            return nullcontext()
+        return self._profiler.capture()
+
 
 class HueSensorBaseDevice(Entity):
     """Common class to handle custom HueSensor entities."""
@@ -188,10 +1117,14 @@ class HueSensorBaseDevice(Entity):
         """Initialize the hue object."""
         self._hue_id = hue_id
         self._data_manager = data_manager
+        self._data = None
+        self._attributes = None
+        self._attributes_generation = None
 
     async def async_added_to_hass(self):
         """Register sensor when entity is added to hass and start updating."""
         self._data_manager.sensors[self.unique_id] = self
+        self._data_manager._join_groups(self)
         await self._data_manager.async_start_scheduler()
         _LOGGER.debug(
             "Setup complete for %s:%s", self.__class__.__name__, self.unique_id
@@ -200,38 +1133,59 @@ class HueSensorBaseDevice(Entity):
     async def async_will_remove_from_hass(self):
         """When entity will be removed from hass."""
         _LOGGER.debug("%s: Removing entity from HA", self.entity_id)
-        self._data_manager.sensors.pop(self.unique_id)
-        self._data_manager.registered_entities.pop(self.unique_id)
+        self._data_manager.sensors.pop(self.unique_id, None)
+        self._data_manager.registered_entities.pop(self.unique_id, None)
+        self._data_manager._leave_groups(self.unique_id)
+        self._data_manager._last_writes.pop(self.unique_id, None)
+        self._data_manager.motion_history.pop(self.unique_id, None)
+        self._data_manager.telemetry.forget(self.unique_id)
+        if self._data_manager._deadband is not None:
+            self._data_manager._deadband.forget(self.unique_id)
 
-        if self._data_manager.sensors:
+        # evicted devices may come back, so the bridges are still polled
+        if self._data_manager.sensors or self._data_manager._evicting:
             return
 
         await self._data_manager.async_stop_scheduler()
 
     @property
-    def sensor_data(self) -> dict:
+    def sensor_data(self) -> SMLState:
         """Access to parsed sensor data."""
-        return self._data_manager.data.get(self.unique_id)
+        data = self._data
+        if data is None:
+            # records are updated in place, so the lookup is done once
+            data = self._data = self._data_manager.data.get(self.unique_id)
+        return data
 
     @property
     def should_poll(self):
         """No polling needed."""
         return False
 
+    @property
+    def available(self):
+        """Return False while the device is missing from the bridge data."""
+        return self.unique_id not in self._data_manager.unavailable_devices
+
     @property
     def name(self):
         """Return the name of the remote."""
-        return self.sensor_data["name"]
+        return self.sensor_data.name
 
     @property
     def unique_id(self):
         """Return the ID of this Hue remote."""
         return self._hue_id
 
+    def _build_attributes(self, data: SMLState) -> dict:
+        """Build the state attributes from the sensor data."""
+        return {key: getattr(data, key) for key in ENTITY_ATTRS.get(data.model, ())}
+
     @property
     def device_state_attributes(self):
-        """Attributes."""
-        return {
-            key: self.sensor_data.get(key)
-            for key in ENTITY_ATTRS.get(self.sensor_data["model"], ())
-        }
+        """Attributes, rebuilt only when the sensor data has changed."""
+        data = self.sensor_data
+        if self._attributes is None or self._attributes_generation != data.generation:
+            self._attributes = self._build_attributes(data)
+            self._attributes_generation = data.generation
+        return self._attributes
@@ -0,0 +1,71 @@
+"""Deadband filtering of the light level and temperature of the SML sensors."""
+from time import monotonic
+from typing import Any, Dict, Optional
+
+# Threshold key: fields published together (the first one is compared)
+DEADBAND_FIELDS = {
+    "lx": ("lx", "light_level"),
+    "temperature": ("temperature",),
+}
+
+
+class DeadbandFilter:
+    """
+    Hold back small or too frequent changes of telemetry fields.
+
+    A new value is only published if it differs from the last published one
+    by at least the threshold of its field, and if `min_interval` seconds have
+    passed since the last published change of that field.
+    """
+
+    def __init__(
+        self, thresholds: Dict[str, float], min_interval: Optional[float] = None
+    ):
+        """Initialize the filter with thresholds by field."""
+        self.thresholds = thresholds
+        self.min_interval = min_interval
+        # dev_id -> {threshold key: time of the last published change}
+        self._published_at: Dict[str, Dict[str, float]] = {}
+
+    def apply(self, dev_id: str, record, parsed: Dict[str, Any]) -> bool:
+        """
+        Replace the held back values in parsed data with the published ones.
+
+        Returns True if a change is only held back by the minimum interval,
+        so it has to be applied again later.
+        """
+        now = monotonic()
+        delayed = False
+        published_at = self._published_at.setdefault(dev_id, {})
+        for key, fields in DEADBAND_FIELDS.items():
+            if fields[0] not in parsed:
+                continue
+            new, old = parsed[fields[0]], getattr(record, fields[0])
+            if (
+                new == old
+                or not isinstance(new, (int, float))
+                or not isinstance(old, (int, float))
+            ):
+                continue
+
+            last_change = published_at.get(key)
+            if abs(new - old) < self.thresholds.get(key, 0):
+                hold = True
+            else:
+                hold = (
+                    self.min_interval is not None
+                    and last_change is not None
+                    and now - last_change < self.min_interval
+                )
+                delayed |= hold
+
+            if hold:
+                for field in fields:
+                    parsed[field] = getattr(record, field)
+            else:
+                published_at[key] = now
+        return delayed
+
+    def forget(self, dev_id: str):
+        """Drop the publish times of a device."""
+        self._published_at.pop(dev_id, None)
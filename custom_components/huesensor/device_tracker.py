@@ -2,6 +2,7 @@
 import asyncio
 import logging
 from datetime import timedelta
+from typing import Dict, List, Optional
 
 import homeassistant.util.dt as dt_util
 from homeassistant.components import zone
@@ -15,15 +16,24 @@ from homeassistant.const import (
     STATE_HOME,
     STATE_NOT_HOME,
 )
-from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.core import State, callback
+from homeassistant.helpers.event import (
+    async_track_state_change,
+    async_track_time_interval,
+)
 from homeassistant.util import slugify
 
 from .data_manager import async_get_bridges
+from .refresh_broker import async_get_refresh_broker
 
 _LOGGER = logging.getLogger(__name__)
 
 TYPE_GEOFENCE = "Geofence"
 DEFAULT_SCAN_INTERVAL = timedelta(seconds=30)
+# Reuse bridge data refreshed by other platforms if younger than this
+MAX_DATA_AGE = timedelta(seconds=5)
+# Max number of concurrent `async_see` calls
+MAX_CONCURRENT_SEES = 4
 
 
 async def async_setup_scanner(hass, config, async_see, discovery_info=None):
@@ -33,62 +43,116 @@ async def async_setup_scanner(hass, config, async_see, discovery_info=None):
     return True
 
 
+class GeofenceState:
+    """Last seen state of a Hue Geofence, with its precomputed device ids."""
+
+    __slots__ = ("name", "dev_id", "presence", "last_updated")
+
+    def __init__(self, name: str):
+        """Initialize the state for the geofence name."""
+        self.name = name
+        self.dev_id = slugify("hue_{}".format(name))
+        self.presence = None
+        self.last_updated = None
+
+
 class HueDeviceScanner(DeviceScanner):
     def __init__(self, hass, async_see):
         """Initialize the scanner."""
         self.hass = hass
         self.async_see = async_see
+        self._geofences: Dict[str, GeofenceState] = {}
+        self._see_semaphore = asyncio.Semaphore(MAX_CONCURRENT_SEES)
+        self._home_gps: Optional[List[float]] = None
+        self._update_home_gps(None, None, hass.states.get(zone.ENTITY_ID_HOME))
+
+    @callback
+    def _update_home_gps(self, entity_id, old_state, new_state: Optional[State]):
+        """Store the coordinates of the home zone."""
+        if new_state is None:
+            self._home_gps = None
+        else:
+            self._home_gps = [
+                new_state.attributes[ATTR_LATITUDE],
+                new_state.attributes[ATTR_LONGITUDE],
+            ]
 
     async def async_start(self, hass, interval):
         """Perform a first update and start polling at the given interval."""
+        async_track_state_change(hass, zone.ENTITY_ID_HOME, self._update_home_gps)
         await self.async_update_info()
         interval = max(interval, DEFAULT_SCAN_INTERVAL)
         async_track_time_interval(hass, self.async_update_info, interval)
 
-    async def async_see_sensor(self, sensor):
+    def _updated_geofence(self, sensor) -> Optional[GeofenceState]:
+        """Return the cached geofence state if the sensor has changed."""
         last_updated = sensor.state.get("lastupdated")
         if not last_updated or last_updated == "none":
-            return
+            return None
+
+        geofence = self._geofences.get(sensor.uniqueid)
+        if geofence is None or geofence.name != sensor.name:
+            geofence = self._geofences[sensor.uniqueid] = GeofenceState(sensor.name)
 
+        presence = bool(sensor.state.get("presence"))
+        if geofence.presence == presence and geofence.last_updated == last_updated:
+            return None
+        geofence.presence = presence
+        geofence.last_updated = last_updated
+        return geofence
+
+    async def async_see_sensor(self, sensor, geofence: GeofenceState):
         kwargs = {
-            "dev_id": slugify("hue_{}".format(sensor.name)),
-            "host_name": sensor.name,
+            "dev_id": geofence.dev_id,
+            "host_name": geofence.name,
             "attributes": {
-                "last_updated": dt_util.as_local(dt_util.parse_datetime(last_updated)),
+                "last_updated": dt_util.as_local(
+                    dt_util.parse_datetime(geofence.last_updated)
+                ),
                 "unique_id": sensor.uniqueid,
             },
         }
 
-        if sensor.state.get("presence"):
+        if geofence.presence:
             kwargs["location_name"] = STATE_HOME
-            zone_home = self.hass.states.get(zone.ENTITY_ID_HOME)
-            if zone_home:
-                kwargs["gps"] = [
-                    zone_home.attributes[ATTR_LATITUDE],
-                    zone_home.attributes[ATTR_LONGITUDE],
-                ]
+            if self._home_gps is not None:
+                kwargs["gps"] = self._home_gps
                 kwargs[ATTR_GPS_ACCURACY] = 0
         else:
             kwargs["location_name"] = STATE_NOT_HOME
 
         _LOGGER.debug(
             "Hue Geofence %s: %s (%s)",
-            sensor.name,
+            geofence.name,
             kwargs["location_name"],
             kwargs["attributes"],
         )
 
-        result = await self.async_see(**kwargs)
-        return result
+        async with self._see_semaphore:
+            try:
+                return await self.async_see(**kwargs)
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Error updating Hue Geofence %s", geofence.name)
+                # retry in the next update
+                geofence.last_updated = None
 
     async def async_update_info(self, now=None):
         """Get the bridge info."""
         async for bridge in async_get_bridges(self.hass):
-            await bridge.sensor_manager.coordinator.async_request_refresh()
-            tasks = [
-                self.async_see_sensor(sensor)
-                for sensor in bridge.api.sensors.values()
-                if sensor.type == TYPE_GEOFENCE
-            ]
-            if tasks:
-                await asyncio.wait(tasks)
+            await async_get_refresh_broker(self.hass, bridge).async_refresh(
+                MAX_DATA_AGE
+            )
+            updated = []
+            for sensor in bridge.api.sensors.values():
+                if sensor.type != TYPE_GEOFENCE:
+                    continue
+                geofence = self._updated_geofence(sensor)
+                if geofence is not None:
+                    updated.append((sensor, geofence))
+            if updated:
+                await asyncio.gather(
+                    *(
+                        self.async_see_sensor(sensor, geofence)
+                        for sensor, geofence in updated
+                    )
+                )
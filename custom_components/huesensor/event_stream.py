@@ -0,0 +1,168 @@
+"""Server-sent event stream listener for Hue bridges."""
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import aiohttp
+
+_LOGGER = logging.getLogger(__name__)
+
+EVENT_STREAM_URL = "https://{host}/eventstream/clip/v2"
+
+# Backoff (in seconds) between reconnection attempts
+RECONNECT_DELAY_MIN = 1
+RECONNECT_DELAY_MAX = 60
+
+
+def _v1_timestamp(timestamp: Optional[str]) -> Optional[str]:
+    """Convert a v2 ISO timestamp into the `lastupdated` format of API v1."""
+    if not timestamp:
+        return None
+    return timestamp.rstrip("Z").split(".")[0]
+
+
+def update_raw_from_event(raw: Dict[str, Any], resource: Dict[str, Any]) -> bool:
+    """
+    Apply an event stream resource update to the raw v1 sensor data.
+
+    Returns True if the raw data has been changed.
+    """
+    raw_state = raw["state"]
+    new_state = {}
+    if resource["type"] == "motion" and "motion" in resource:
+        motion = resource["motion"]
+        report = motion.get("motion_report") or {}
+        new_state["presence"] = report.get("motion", motion.get("motion"))
+        new_state["lastupdated"] = _v1_timestamp(
+            report.get("changed", resource.get("creationtime"))
+        )
+    elif resource["type"] == "light_level" and "light" in resource:
+        light = resource["light"]
+        report = light.get("light_level_report") or {}
+        lightlevel = report.get("light_level", light.get("light_level"))
+        new_state["lightlevel"] = lightlevel
+        new_state["lastupdated"] = _v1_timestamp(
+            report.get("changed", resource.get("creationtime"))
+        )
+        if lightlevel is not None:
+            # API v2 doesn't send the dark/daylight flags, derive them from config
+            tholddark = raw["config"].get("tholddark")
+            tholdoffset = raw["config"].get("tholdoffset")
+            if tholddark is not None:
+                new_state["dark"] = lightlevel <= tholddark
+                if tholdoffset is not None:
+                    new_state["daylight"] = lightlevel >= tholddark + tholdoffset
+    elif resource["type"] == "temperature" and "temperature" in resource:
+        temperature = resource["temperature"]
+        report = temperature.get("temperature_report") or {}
+        value = report.get("temperature", temperature.get("temperature"))
+        new_state["temperature"] = round(value * 100) if value is not None else None
+        new_state["lastupdated"] = _v1_timestamp(
+            report.get("changed", resource.get("creationtime"))
+        )
+
+    if new_state.get("lastupdated") is None:
+        new_state.pop("lastupdated", None)
+
+    changed = any(raw_state.get(key) != value for key, value in new_state.items())
+    raw_state.update(new_state)
+    return changed
+
+
+class HueEventStream:
+    """Listener for the server-sent event stream of one Hue bridge."""
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        app_key: str,
+        on_events: Callable[[List[Dict[str, Any]]], Awaitable[None]],
+    ):
+        """Initialize the event stream listener."""
+        self._session = session
+        self._url = url
+        self._app_key = app_key
+        self._on_events = on_events
+        self._task: Optional[asyncio.Task] = None
+        self.connected = False
+
+    @property
+    def streaming(self) -> bool:
+        """Return True if the listener is running and connected to the bridge."""
+        return self.connected and self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start listening in a background task."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def async_stop(self):
+        """Stop listening and close the connection."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.connected = False
+
+    async def _run(self):
+        """Keep the stream connection alive, reconnecting with backoff."""
+        delay = RECONNECT_DELAY_MIN
+        while True:
+            try:
+                await self._listen()
+                delay = RECONNECT_DELAY_MIN
+            except asyncio.CancelledError:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as exc:
+                _LOGGER.debug("Event stream %s unavailable: %s", self._url, exc)
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Unexpected error in event stream %s", self._url)
+            finally:
+                if self.connected:
+                    _LOGGER.info("Event stream %s disconnected", self._url)
+                self.connected = False
+            await asyncio.sleep(delay)
+            delay = min(2 * delay, RECONNECT_DELAY_MAX)
+
+    async def _listen(self):
+        """Connect to the bridge and dispatch events until the stream ends."""
+        headers = {"hue-application-key": self._app_key, "Accept": "text/event-stream"}
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=10)
+        async with self._session.get(
+            self._url, headers=headers, timeout=timeout, ssl=False
+        ) as response:
+            response.raise_for_status()
+            self.connected = True
+            _LOGGER.info("Event stream %s connected", self._url)
+
+            data_lines = []
+            async for line in response.content:
+                line = line.decode("utf-8").rstrip("\r\n")
+                if line.startswith("data:"):
+                    data_lines.append(line[5:].strip())
+                elif not line and data_lines:
+                    await self._dispatch("".join(data_lines))
+                    data_lines = []
+
+    async def _dispatch(self, payload: str):
+        """Decode an event message and pass the updated resources on."""
+        resources = []
+        for event in json.loads(payload):
+            if event.get("type") != "update":
+                continue
+            for resource in event.get("data", ()):
+                resource.setdefault("creationtime", event.get("creationtime"))
+                if resource.get("id_v1", "").startswith("/sensors/"):
+                    resources.append(resource)
+        if not resources:
+            return
+        try:
+            await self._on_events(resources)
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.exception("Error processing events of %s", self._url)
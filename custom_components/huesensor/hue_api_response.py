@@ -1,5 +1,5 @@
 """Hue API data parsing for sensors."""
-from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple, Union
 
 from homeassistant.const import STATE_OFF, STATE_ON
 
@@ -20,76 +20,181 @@ ENTITY_ATTRS = {
         "threshold_offset",
     ],
 }
+# Fields shown by the sensor entities of the light level and temperature
+TELEMETRY_ATTRS = (
+    "light_level",
+    "lx",
+    "dark",
+    "daylight",
+    "threshold_dark",
+    "threshold_offset",
+    "temperature",
+)
+# Fields shown by the entities, whose changes need a state write
+ENTITY_FIELDS = {
+    model: frozenset(("name", "state", "changed", *attrs))
+    for model, attrs in ENTITY_ATTRS.items()
+}
+
+
+class SMLState:
+    """Parsed state of a SML Hue motion sensor, merged from its 3 resources."""
+
+    __slots__ = (
+        "model",
+        "name",
+        "state",
+        "changed",
+        "battery",
+        "on",
+        "reachable",
+        "sensitivity",
+        "last_updated",
+        "light_level",
+        "lx",
+        "dark",
+        "daylight",
+        "threshold_dark",
+        "threshold_offset",
+        "temperature",
+        "generation",
+    )
+    _entity_fields = ENTITY_FIELDS["SML"]
+
+    def __init__(self):
+        """Initialize an empty record."""
+        for field in self.__slots__:
+            setattr(self, field, None)
+        self.model = "SML"
+        self.generation = 0
+
+    def __getitem__(self, key: str) -> Any:
+        """Mapping-like access to a field."""
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: Any):
+        """
+        Set a field in place.
+
+        The generation of the record only grows with changes of the fields
+        shown by the entities.
+        """
+        if getattr(self, key) != value:
+            setattr(self, key, value)
+            if key in self._entity_fields:
+                self.generation += 1
 
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return a field value, or a default for unknown fields."""
+        return getattr(self, key, default)
 
-def parse_sml(response: Dict[str, Any]) -> Dict[str, Any]:
-    """Parse the json for a SML Hue motion sensor and return the data."""
-    data = {}
+    @classmethod
+    def from_dict(cls, fields: Dict[str, Any]) -> "SMLState":
+        """Create a record with the data of `as_dict`."""
+        record = cls()
+        for field, value in fields.items():
+            if field in cls.__slots__ and field != "generation":
+                setattr(record, field, value)
+        return record
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the record data as a plain dict."""
+        return {
+            field: getattr(self, field)
+            for field in self.__slots__
+            if field != "generation"
+        }
+
+
+SENSOR_RECORDS = {"SML": SMLState}
+
+
+def parse_sml(
+    response: Dict[str, Any], data: Optional[SMLState] = None
+) -> Union[Dict[str, Any], SMLState]:
+    """
+    Parse the json for a SML Hue motion sensor and return the data.
+
+    If a record is given, parsed data is written into it in place.
+    """
+    if data is None:
+        data = {}
     if response["type"] == "ZLLLightLevel":
         lightlevel = response["state"]["lightlevel"]
-        tholddark = response["config"]["tholddark"]
-        tholdoffset = response["config"]["tholdoffset"]
         if lightlevel is not None:
-            lx = round(float(10 ** ((lightlevel - 1) / 10000)), 2)
-            dark = response["state"]["dark"]
-            daylight = response["state"]["daylight"]
-            data = {
-                "light_level": lightlevel,
-                "lx": lx,
-                "dark": dark,
-                "daylight": daylight,
-                "threshold_dark": tholddark,
-                "threshold_offset": tholdoffset,
-            }
+            data["light_level"] = lightlevel
+            data["lx"] = round(float(10 ** ((lightlevel - 1) / 10000)), 2)
+            data["dark"] = response["state"]["dark"]
+            data["daylight"] = response["state"]["daylight"]
+            data["threshold_dark"] = response["config"]["tholddark"]
+            data["threshold_offset"] = response["config"]["tholdoffset"]
         else:
-            data = {
-                "light_level": "No light level data",
-                "lx": None,
-                "dark": None,
-                "daylight": None,
-                "threshold_dark": None,
-                "threshold_offset": None,
-            }
+            data["light_level"] = "No light level data"
+            data["lx"] = None
+            data["dark"] = None
+            data["daylight"] = None
+            data["threshold_dark"] = None
+            data["threshold_offset"] = None
 
     elif response["type"] == "ZLLTemperature":
         temp = response["state"]["temperature"]
         temp = temp / 100.0 if temp is not None else "No temperature data"
-        data = {"temperature": temp}
+        data["temperature"] = temp
 
     elif response["type"] == "ZLLPresence":
         name_raw = response["name"]
         arr = name_raw.split()
         arr.insert(-1, "motion")
-        name = " ".join(arr)
         hue_state = response["state"]["presence"]
-        state = STATE_ON if hue_state is True else STATE_OFF
-
-        data = {
-            "model": "SML",
-            "name": name,
-            "state": state,
-            "battery": response["config"]["battery"],
-            "on": response["config"]["on"],
-            "reachable": response["config"]["reachable"],
-            "sensitivity": response["config"]["sensitivity"],
-            "last_updated": response["state"]["lastupdated"].split("T"),
-        }
+
+        data["model"] = "SML"
+        data["name"] = " ".join(arr)
+        data["state"] = STATE_ON if hue_state is True else STATE_OFF
+        data["battery"] = response["config"]["battery"]
+        data["on"] = response["config"]["on"]
+        data["reachable"] = response["config"]["reachable"]
+        data["sensitivity"] = response["config"]["sensitivity"]
+        data["last_updated"] = response["state"]["lastupdated"].split("T")
     return data
 
 
-def parse_hue_api_response(sensors: Iterable[Dict[str, Any]]):
-    """Take in the Hue API json response."""
-    data_dict = {}  # The list of sensors, referenced by their hue_id.
+def raw_fingerprint(response: Dict[str, Any]) -> Tuple:
+    """Cheap identity of the raw data of a sensor, to detect changes in it."""
+    return (
+        response["name"],
+        *response["state"].values(),
+        *(
+            value
+            for value in response["config"].values()
+            if not isinstance(value, (list, dict))
+        ),
+    )
 
-    # Filter sensors by model.
-    for sensor in filter(lambda x: x["modelid"].startswith("SML"), sensors):
-        model_id = sensor["modelid"][0:3]
-        unique_sensor_id = sensor["uniqueid"]
-        _key = model_id + "_" + unique_sensor_id[:-5]
+
+def get_device_id(response: Dict[str, Any]) -> str:
+    """Return the id of the device a raw sensor resource belongs to."""
+    return response["modelid"][0:3] + "_" + response["uniqueid"][:-5]
+
+
+def parse_device_resources(
+    resources: Iterable[Tuple[str, Dict[str, Any]]]
+) -> Dict[str, Dict[str, Any]]:
+    """Parse raw sensor resources and merge them by their device id."""
+    data_dict = {}
+    for dev_id, sensor in resources:
         parsed_sensor = parse_sml(sensor)
-        if _key not in data_dict:
-            data_dict[_key] = parsed_sensor
+        if dev_id not in data_dict:
+            data_dict[dev_id] = parsed_sensor
         else:
-            data_dict[_key].update(parsed_sensor)
+            data_dict[dev_id].update(parsed_sensor)
 
     return data_dict
+
+
+def parse_hue_api_response(sensors: Iterable[Dict[str, Any]]):
+    """Take in the Hue API json response."""
+    # Filter sensors by model.
+    return parse_device_resources(
+        (get_device_id(sensor), sensor)
+        for sensor in filter(lambda x: x["modelid"].startswith("SML"), sensors)
+    )
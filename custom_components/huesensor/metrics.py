@@ -0,0 +1,75 @@
+"""Performance metrics of the huesensor data manager."""
+from collections import deque
+from typing import Any, Dict
+
+# Number of samples kept for each metric
+METRICS_WINDOW = 500
+
+
+class RollingStats:
+    """Rolling window of samples of a metric, summarised on demand."""
+
+    def __init__(self, size: int = METRICS_WINDOW):
+        """Initialize the sample window."""
+        self._samples = deque(maxlen=size)
+        self.total = 0
+
+    def add(self, value: float):
+        """Add a sample."""
+        self._samples.append(value)
+        self.total += 1
+
+    def summary(self) -> Dict[str, Any]:
+        """Return count, last, mean, percentiles and max of the window."""
+        if not self._samples:
+            return {"count": 0}
+        ordered = sorted(self._samples)
+        size = len(ordered)
+        return {
+            "count": self.total,
+            "last": round(self._samples[-1], 4),
+            "mean": round(sum(ordered) / size, 4),
+            "p50": round(ordered[size // 2], 4),
+            "p95": round(ordered[min(size - 1, int(size * 0.95))], 4),
+            "max": round(ordered[-1], 4),
+        }
+
+
+class DataManagerMetrics:
+    """Per-tick metrics of the data manager, with per-bridge refresh latency."""
+
+    def __init__(self):
+        """Initialize empty metrics."""
+        self.bridge_refresh: Dict[str, RollingStats] = {}
+        self.bridge_timeouts: Dict[str, int] = {}
+        self.parse_time = RollingStats()
+        self.devices_changed = RollingStats()
+        self.state_writes = RollingStats()
+        self.missed_pulses = 0
+
+    def record_refresh(self, host: str, latency: float):
+        """Add a bridge refresh latency sample, in seconds."""
+        if host not in self.bridge_refresh:
+            self.bridge_refresh[host] = RollingStats()
+        self.bridge_refresh[host].add(latency)
+
+    def record_timeout(self, host: str):
+        """Count a bridge refresh timeout."""
+        self.bridge_timeouts[host] = self.bridge_timeouts.get(host, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the summary of all metrics."""
+        hosts = set(self.bridge_refresh) | set(self.bridge_timeouts)
+        return {
+            "bridge_refresh": {
+                host: {
+                    **self.bridge_refresh.get(host, RollingStats()).summary(),
+                    "timeouts": self.bridge_timeouts.get(host, 0),
+                }
+                for host in sorted(hosts)
+            },
+            "parse_time": self.parse_time.summary(),
+            "devices_changed": self.devices_changed.summary(),
+            "state_writes": self.state_writes.summary(),
+            "missed_pulses": self.missed_pulses,
+        }
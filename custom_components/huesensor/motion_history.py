@@ -0,0 +1,89 @@
+"""Bounded history of motion transitions of the Hue motion sensors."""
+from array import array
+from datetime import datetime, timezone
+from time import time
+from typing import List, Optional
+
+# Max number of on/off transitions kept for each sensor
+HISTORY_SIZE = 256
+
+
+def bridge_timestamp(last_updated: List[str]) -> float:
+    """Return the POSIX timestamp of a parsed `last_updated` of the bridge (UTC)."""
+    try:
+        return (
+            datetime.strptime(" ".join(last_updated), "%Y-%m-%d %H:%M:%S")
+            .replace(tzinfo=timezone.utc)
+            .timestamp()
+        )
+    except (TypeError, ValueError):
+        return time()
+
+
+class MotionHistory:
+    """
+    Ring buffer of the motion on/off transitions of one sensor.
+
+    Timestamps and states are stored in fixed-size arrays, along with the
+    running count of 'on' transitions, so memory is bounded and window
+    queries are a binary search over the (ordered) timestamps.
+    """
+
+    __slots__ = ("_times", "_states", "_on_counts", "_start", "_size", "last_motion")
+
+    def __init__(self, capacity: int = HISTORY_SIZE):
+        """Initialize an empty history."""
+        self._times = array("d", [0.0]) * capacity
+        self._states = array("b", [0]) * capacity
+        self._on_counts = array("Q", [0]) * capacity
+        self._start = 0
+        self._size = 0
+        self.last_motion: Optional[float] = None
+
+    def __len__(self) -> int:
+        """Return the number of stored transitions."""
+        return self._size
+
+    def _index(self, position: int) -> int:
+        """Return the array index of a position, 0 being the oldest."""
+        return (self._start + position) % len(self._times)
+
+    def record(self, timestamp: float, is_on: bool):
+        """Store a transition, dropping the oldest one if the buffer is full."""
+        capacity = len(self._times)
+        on_count = self._on_counts[self._index(self._size - 1)] if self._size else 0
+        if self._size == capacity:
+            idx = self._start
+            self._start = (self._start + 1) % capacity
+        else:
+            idx = self._index(self._size)
+            self._size += 1
+
+        self._times[idx] = timestamp
+        self._states[idx] = is_on
+        self._on_counts[idx] = on_count + is_on
+        if is_on:
+            self.last_motion = timestamp
+
+    def count_since(self, since: float) -> int:
+        """Return the number of motion detections from the `since` timestamp."""
+        if not self._size:
+            return 0
+        # first position with a timestamp >= since
+        low, high = 0, self._size
+        while low < high:
+            mid = (low + high) // 2
+            if self._times[self._index(mid)] < since:
+                low = mid + 1
+            else:
+                high = mid
+        if low == self._size:
+            return 0
+
+        total = self._on_counts[self._index(self._size - 1)]
+        if low:
+            before = self._on_counts[self._index(low - 1)]
+        else:
+            # running counts also include the transitions already dropped
+            before = self._on_counts[self._start] - self._states[self._start]
+        return total - before
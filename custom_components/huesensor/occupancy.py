@@ -0,0 +1,40 @@
+"""Occupancy of declared groups of Hue motion sensors."""
+from typing import Iterable, Optional, Set
+
+
+class OccupancyGroup:
+    """
+    Group of motion sensors, occupied while any of its members detects motion.
+
+    The members with motion are kept in a set, so each member change is O(1)
+    and only changes that flip the occupancy need a state write.
+    """
+
+    __slots__ = ("name", "entity_ids", "_on_members", "entity")
+
+    def __init__(self, name: str, entity_ids: Iterable[str]):
+        """Initialize an empty group."""
+        self.name = name
+        self.entity_ids = frozenset(entity_ids)
+        self._on_members: Set[str] = set()
+        # entity showing the group state, once added to hass
+        self.entity = None
+
+    @property
+    def occupied(self) -> bool:
+        """Return True if any member detects motion."""
+        return bool(self._on_members)
+
+    @property
+    def members_on(self) -> int:
+        """Return the number of members detecting motion."""
+        return len(self._on_members)
+
+    def set_member(self, dev_id: str, is_on: Optional[bool]) -> bool:
+        """Update the motion state of a member, returning True if occupancy flipped."""
+        was_occupied = bool(self._on_members)
+        if is_on:
+            self._on_members.add(dev_id)
+        else:
+            self._on_members.discard(dev_id)
+        return was_occupied != bool(self._on_members)
@@ -0,0 +1,70 @@
+"""On-demand profiling of the updates of the huesensor data manager."""
+import cProfile
+import io
+import pstats
+from contextlib import contextmanager
+from time import monotonic
+from typing import Optional
+
+# Number of functions listed in each section of the report
+PROFILE_REPORT_SIZE = 30
+
+
+class TickProfiler:
+    """
+    Deterministic profiler (cProfile) of a number of update ticks.
+
+    It is only enabled around the synchronous parts of the ticks, so other
+    tasks of the event loop are not profiled, and it is done after `ticks`
+    ticks or, if given, once `seconds` have passed since it was created.
+    """
+
+    def __init__(self, ticks: int, seconds: Optional[float] = None):
+        """Initialize the profiler."""
+        self._profile = cProfile.Profile()
+        self.max_ticks = ticks
+        self.ticks = 0
+        self.captured = False
+        self._deadline = monotonic() + seconds if seconds is not None else None
+
+    @property
+    def done(self) -> bool:
+        """Return True if the capture is complete."""
+        if self._deadline is not None:
+            return monotonic() >= self._deadline
+        return self.ticks >= self.max_ticks
+
+    def check(self):
+        """Raise ValueError if the profiler can't be enabled (Python 3.12+)."""
+        self._profile.enable()
+        self._profile.disable()
+
+    @contextmanager
+    def capture(self):
+        """Profile the code run in the context, if no other profiler is active."""
+        try:
+            self._profile.enable()
+        except ValueError:
+            # another profiler was enabled since the capture was requested
+            yield
+            return
+        self.captured = True
+        try:
+            yield
+        finally:
+            self._profile.disable()
+
+    def report(self) -> str:
+        """Return the top functions, by cumulative and by own time."""
+        stream = io.StringIO()
+        stream.write(f"Profile of {self.ticks} ticks\n")
+        stats = pstats.Stats(self._profile, stream=stream)
+        for sort_key in ("cumulative", "tottime"):
+            stats.sort_stats(sort_key).print_stats(PROFILE_REPORT_SIZE)
+        return stream.getvalue()
+
+    def save(self, path: str):
+        """Write the profile data (to `path`) and its report (to `path`.txt)."""
+        self._profile.dump_stats(path)
+        with open(f"{path}.txt", "w") as report_file:
+            report_file.write(self.report())
@@ -0,0 +1,62 @@
+"""Shared data refresh of Hue bridges for all huesensor platforms."""
+import asyncio
+from datetime import timedelta
+from time import monotonic
+from typing import Optional
+
+from homeassistant.components.hue import HueBridge
+
+from . import DOMAIN
+
+DATA_REFRESH_BROKERS = f"{DOMAIN}_refresh_brokers"
+
+
+def async_get_refresh_broker(hass, bridge: HueBridge) -> "BridgeRefreshBroker":
+    """Return the shared refresh broker for a bridge, creating it if needed."""
+    brokers = hass.data.setdefault(DATA_REFRESH_BROKERS, {})
+    broker = brokers.get(bridge.host)
+    if broker is None or broker.bridge is not bridge:
+        broker = brokers[bridge.host] = BridgeRefreshBroker(bridge)
+    return broker
+
+
+class BridgeRefreshBroker:
+    """
+    Coalesce data refresh requests for one Hue bridge.
+
+    Concurrent requests share a single in-flight refresh, and requests that
+    accept data of some age are served with the last refreshed data if it is
+    fresh enough, without calling the bridge at all.
+    """
+
+    def __init__(self, bridge: HueBridge):
+        """Initialize the broker."""
+        self.bridge = bridge
+        self.last_refresh: Optional[float] = None
+        self._pending: Optional[asyncio.Future] = None
+
+    @property
+    def data_age(self) -> Optional[float]:
+        """Return the age in seconds of the bridge data, if refreshed."""
+        if self.last_refresh is None:
+            return None
+        return monotonic() - self.last_refresh
+
+    async def async_refresh(self, max_age: timedelta = timedelta(0)):
+        """Make sure bridge data is no older than `max_age`."""
+        age = self.data_age
+        if age is not None and age <= max_age.total_seconds():
+            return
+
+        if self._pending is None:
+            self._pending = asyncio.ensure_future(self._async_refresh())
+        # a caller timing out must not cancel the refresh shared with others
+        await asyncio.shield(self._pending)
+
+    async def _async_refresh(self):
+        """Request fresh data from the bridge."""
+        try:
+            await self.bridge.sensor_manager.coordinator.async_request_refresh()
+            self.last_refresh = monotonic()
+        finally:
+            self._pending = None
@@ -0,0 +1,117 @@
+"""Polling schedule helpers for the huesensor data manager."""
+import asyncio
+from datetime import timedelta
+from time import monotonic
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from homeassistant.core import callback
+
+# Keep polling at the fastest rate for this long after the last activity
+ACTIVITY_COOLDOWN = timedelta(minutes=1)
+
+
+class AdaptivePollBackoff:
+    """
+    Activity-driven polling interval for one bridge.
+
+    While there is activity, the bridge is polled at `min_interval`. Once it
+    has been idle for longer than the activity cooldown, the interval doubles
+    on each poll up to `max_interval`, which bounds the detection latency.
+    The first activity found snaps the interval back to `min_interval`.
+    """
+
+    def __init__(self, min_interval: timedelta, max_interval: timedelta):
+        """Initialize the backoff at the fastest rate."""
+        self.min_interval = min_interval.total_seconds()
+        self.max_interval = max(max_interval.total_seconds(), self.min_interval)
+        self.interval = self.min_interval
+        self.last_activity = monotonic()
+        self.next_poll = 0.0
+
+    def is_due(self) -> bool:
+        """Return True if the bridge should be polled now."""
+        return monotonic() >= self.next_poll
+
+    def record_poll(self, active: bool):
+        """Adapt the polling interval after a poll of the bridge."""
+        now = monotonic()
+        if active:
+            self.last_activity = now
+            self.interval = self.min_interval
+        elif now - self.last_activity > ACTIVITY_COOLDOWN.total_seconds():
+            self.interval = min(2 * self.interval, self.max_interval)
+        # half a tick of tolerance, so polls are not delayed a whole tick
+        self.next_poll = now + self.interval - self.min_interval / 2
+
+
+class TickScheduler:
+    """
+    Fixed-rate scheduler for sub-second polling.
+
+    Ticks are scheduled on the event loop clock, on a fixed grid, without
+    depending on the 1 s resolution of the HA timer. A tick never starts
+    while the update of the previous one is still running: it is skipped
+    and counted as an overrun. Ticks missed because the loop was blocked
+    are skipped too, without bursts of catch-up updates.
+    """
+
+    def __init__(
+        self, hass, interval: timedelta, action: Callable[[], Awaitable[None]]
+    ):
+        """Initialize the scheduler."""
+        self._hass = hass
+        self.interval = interval.total_seconds()
+        self._action = action
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._task: Optional[asyncio.Future] = None
+        self._next_tick = 0.0
+
+        self.ticks = 0
+        self.overruns = 0
+        self.missed_ticks = 0
+        self.last_lateness = 0.0
+        self.max_lateness = 0.0
+
+    def start(self):
+        """Start ticking, with the first tick after one interval."""
+        self.stop()
+        self._next_tick = self._hass.loop.time() + self.interval
+        self._handle = self._hass.loop.call_at(self._next_tick, self._tick)
+
+    def stop(self):
+        """Stop scheduling ticks. A running update is left to finish."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    @callback
+    def _tick(self):
+        """Run the update for this tick, if the previous one has finished."""
+        now = self._hass.loop.time()
+        self.last_lateness = now - self._next_tick
+        self.max_lateness = max(self.max_lateness, self.last_lateness)
+
+        if self._task is not None and not self._task.done():
+            self.overruns += 1
+        else:
+            self.ticks += 1
+            self._task = self._hass.async_create_task(self._action())
+
+        self._next_tick += self.interval
+        if self._next_tick <= now:
+            missed = int((now - self._next_tick) // self.interval) + 1
+            self.missed_ticks += missed
+            self._next_tick += missed * self.interval
+        self._handle = self._hass.loop.call_at(self._next_tick, self._tick)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Return the tick counters of the scheduler."""
+        return {
+            "interval": self.interval,
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "missed_ticks": self.missed_ticks,
+            "last_lateness": round(self.last_lateness, 4),
+            "max_lateness": round(self.max_lateness, 4),
+        }
@@ -0,0 +1,297 @@
+"""Light level and temperature sensors, and diagnostics of the integration."""
+import logging
+from datetime import timedelta
+from typing import Dict, List
+
+import homeassistant.helpers.config_validation as cv
+import voluptuous as vol
+from homeassistant.components.sensor import PLATFORM_SCHEMA
+from homeassistant.const import (
+    CONF_SCAN_INTERVAL,
+    DEVICE_CLASS_ILLUMINANCE,
+    DEVICE_CLASS_TEMPERATURE,
+    TEMP_CELSIUS,
+)
+from homeassistant.core import callback
+from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.event import async_track_time_interval
+
+from .data_manager import HueSensorData, async_get_data_manager
+
+_LOGGER = logging.getLogger(__name__)
+
+CONF_DIAGNOSTICS = "diagnostics"
+CONF_TELEMETRY = "telemetry"
+
+PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
+    {
+        vol.Optional(CONF_DIAGNOSTICS, default=False): cv.boolean,
+        vol.Optional(CONF_TELEMETRY, default=False): cv.boolean,
+    }
+)
+
+SCAN_INTERVAL = timedelta(seconds=30)
+
+
+def _worst_bridge_latency(snapshot):
+    latencies = [
+        stats["mean"] * 1000
+        for stats in snapshot["bridge_refresh"].values()
+        if stats["count"]
+    ]
+    return round(max(latencies), 1) if latencies else None
+
+
+def _mean_ms(key):
+    def _get_value(snapshot):
+        mean = snapshot[key].get("mean")
+        return round(mean * 1000, 2) if mean is not None else None
+
+    return _get_value
+
+
+def _mean(key):
+    def _get_value(snapshot):
+        return snapshot[key].get("mean")
+
+    return _get_value
+
+
+# metric: (name, unit, value from snapshot, attributes from snapshot)
+DIAGNOSTIC_SENSORS = {
+    "bridge_refresh": (
+        "Bridge refresh latency",
+        "ms",
+        _worst_bridge_latency,
+        lambda snapshot: snapshot["bridge_refresh"],
+    ),
+    "parse_time": (
+        "Parse time",
+        "ms",
+        _mean_ms("parse_time"),
+        lambda snapshot: snapshot["parse_time"],
+    ),
+    "devices_changed": (
+        "Devices changed",
+        "devices",
+        _mean("devices_changed"),
+        lambda snapshot: snapshot["devices_changed"],
+    ),
+    "state_writes": (
+        "State writes",
+        "writes",
+        _mean("state_writes"),
+        lambda snapshot: snapshot["state_writes"],
+    ),
+    "scheduler_overruns": (
+        "Scheduler overruns",
+        "ticks",
+        lambda snapshot: snapshot.get("scheduler", {}).get("overruns"),
+        lambda snapshot: snapshot.get("scheduler", {}),
+    ),
+}
+
+
+# kind: (name suffix, unit, device class, state field, attribute fields)
+TELEMETRY_SENSORS = {
+    "light_level": (
+        "light level",
+        "lx",
+        DEVICE_CLASS_ILLUMINANCE,
+        "lx",
+        ("light_level", "dark", "daylight", "threshold_dark", "threshold_offset"),
+    ),
+    "temperature": (
+        "temperature",
+        TEMP_CELSIUS,
+        DEVICE_CLASS_TEMPERATURE,
+        "temperature",
+        (),
+    ),
+}
+
+
+async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
+    """Set up the sensors of the integration."""
+    data_manager = async_get_data_manager(hass)
+    if config.get(CONF_DIAGNOSTICS, False):
+        async_add_entities(
+            [HueSensorMetric(data_manager, metric) for metric in DIAGNOSTIC_SENSORS],
+            True,
+        )
+
+    if config.get(CONF_TELEMETRY, False):
+        scan_interval = config.get(CONF_SCAN_INTERVAL, SCAN_INTERVAL)
+        data_manager.split_telemetry = True
+        updater = HueTelemetryUpdater(data_manager, async_add_entities, scan_interval)
+        hass.async_create_task(updater.async_update())
+        async_track_time_interval(hass, updater.async_update, scan_interval)
+
+
+class HueTelemetryUpdater:
+    """Update the light level and temperature sensors at their own interval."""
+
+    def __init__(self, data_manager: HueSensorData, async_add_entities, scan_interval):
+        """Initialize the updater."""
+        self._data_manager = data_manager
+        self._async_add_entities = async_add_entities
+        # bridge data refreshed by the motion sensors is reused if fresh enough
+        self._max_age = scan_interval.total_seconds() / 2
+        self.entities: Dict[str, List[HueTelemetrySensor]] = {}
+        self._unavailable = set()
+
+    async def async_update(self, now=None):
+        """Parse new telemetry data, adding new sensors and writing changes."""
+        updated_devices = []
+        async for updated, _, dev_id, _ in self._data_manager.async_iter_telemetry(
+            self._max_age
+        ):
+            if updated:
+                updated_devices.append(dev_id)
+
+        # devices that changed their availability since the last update
+        unavailable = set(self._data_manager.unavailable_devices)
+        updated_devices.extend(unavailable ^ self._unavailable)
+        self._unavailable = unavailable
+
+        # sensors of the devices evicted by the data manager are removed
+        for dev_id in self.entities.keys() - self._data_manager.data.keys():
+            for entity in self.entities.pop(dev_id):
+                if entity.hass is not None:
+                    await entity.async_remove()
+
+        new_entities = []
+        for dev_id, record in self._data_manager.data.items():
+            # devices are added when their motion data, with the name, is known
+            if dev_id not in self.entities and record.name is not None:
+                self.entities[dev_id] = [
+                    HueTelemetrySensor(dev_id, self._data_manager, kind)
+                    for kind in TELEMETRY_SENSORS
+                ]
+                new_entities.extend(self.entities[dev_id])
+
+        for dev_id in updated_devices:
+            for entity in self.entities.get(dev_id, ()):
+                entity.async_write_if_changed()
+
+        if new_entities:
+            self._async_add_entities(new_entities)
+
+
+class HueTelemetrySensor(Entity):
+    """Light level or temperature of a Hue motion sensor."""
+
+    def __init__(self, dev_id: str, data_manager: HueSensorData, kind: str):
+        """Initialize the sensor."""
+        self._dev_id = dev_id
+        self._data_manager = data_manager
+        self._kind = kind
+        self._last_written = None
+
+    def _state_key(self):
+        if not self.available:
+            return None
+        return self.state, tuple(self.device_state_attributes.values())
+
+    async def async_added_to_hass(self):
+        """Keep the state written when the entity is added."""
+        self._last_written = self._state_key()
+
+    @callback
+    def async_write_if_changed(self):
+        """Write the state if the sensor value or its attributes have changed."""
+        if self.hass is None:
+            return
+        written = self._state_key()
+        if written != self._last_written:
+            self._last_written = written
+            self.async_write_ha_state()
+
+    @property
+    def sensor_data(self):
+        """Access to parsed sensor data."""
+        return self._data_manager.data.get(self._dev_id)
+
+    @property
+    def should_poll(self):
+        """No polling needed."""
+        return False
+
+    @property
+    def available(self):
+        """Return False while the device is missing from the bridge data."""
+        return self._dev_id not in self._data_manager.unavailable_devices
+
+    @property
+    def unique_id(self):
+        """Return the ID of the sensor."""
+        return f"{self._dev_id}_{self._kind}"
+
+    @property
+    def name(self):
+        """Return the name of the sensor."""
+        return f"{self.sensor_data.name} {TELEMETRY_SENSORS[self._kind][0]}"
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of the sensor."""
+        return TELEMETRY_SENSORS[self._kind][1]
+
+    @property
+    def device_class(self):
+        """Return the class of the sensor."""
+        return TELEMETRY_SENSORS[self._kind][2]
+
+    @property
+    def state(self):
+        """Return the sensor value."""
+        return getattr(self.sensor_data, TELEMETRY_SENSORS[self._kind][3])
+
+    @property
+    def device_state_attributes(self):
+        """Return the other fields of the sensor."""
+        data = self.sensor_data
+        return {key: getattr(data, key) for key in TELEMETRY_SENSORS[self._kind][4]}
+
+
+class HueSensorMetric(Entity):
+    """Diagnostic sensor with a performance metric of the data manager."""
+
+    def __init__(self, data_manager: HueSensorData, metric: str):
+        """Initialize the metric sensor."""
+        self._data_manager = data_manager
+        self._metric = metric
+        self._snapshot = None
+
+    async def async_update(self):
+        """Take a new snapshot of the metrics."""
+        self._snapshot = self._data_manager.metrics_snapshot()
+
+    @property
+    def unique_id(self):
+        """Return the unique ID of the metric sensor."""
+        return f"huesensor_metric_{self._metric}"
+
+    @property
+    def name(self):
+        """Return the name of the metric sensor."""
+        return f"Hue sensors {DIAGNOSTIC_SENSORS[self._metric][0]}"
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of the metric."""
+        return DIAGNOSTIC_SENSORS[self._metric][1]
+
+    @property
+    def state(self):
+        """Return the current value of the metric."""
+        if self._snapshot is None:
+            return None
+        return DIAGNOSTIC_SENSORS[self._metric][2](self._snapshot)
+
+    @property
+    def device_state_attributes(self):
+        """Return the summary of the metric."""
+        if self._snapshot is None:
+            return None
+        return DIAGNOSTIC_SENSORS[self._metric][3](self._snapshot)
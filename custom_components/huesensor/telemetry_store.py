@@ -0,0 +1,276 @@
+"""Columnar store of the light level and temperature samples of the SML sensors."""
+import math
+from array import array
+from time import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Fields of the SML records stored as columns
+TELEMETRY_FIELDS = ("light_level", "lx", "temperature")
+# Max number of raw samples kept for each device
+SAMPLES_SIZE = 256
+# Rollups of the samples: (bucket size in seconds, number of buckets kept)
+ROLLUPS = ((60, 120), (900, 96), (3600, 168))
+
+# Aggregate of one field: [count, sum, min, max]
+_Aggregate = List[float]
+
+
+def _new_aggregates() -> List[_Aggregate]:
+    return [[0, 0.0, math.inf, -math.inf] for _ in TELEMETRY_FIELDS]
+
+
+def _summarize(aggregates: List[_Aggregate]) -> Dict[str, Optional[dict]]:
+    """Return the min, max and mean of each field, or None without samples."""
+    return {
+        field: (
+            {
+                "min": round(agg[2], 2),
+                "max": round(agg[3], 2),
+                "mean": round(agg[1] / agg[0], 2),
+                "samples": int(agg[0]),
+            }
+            if agg[0]
+            else None
+        )
+        for field, agg in zip(TELEMETRY_FIELDS, aggregates)
+    }
+
+
+class TelemetryRollup:
+    """
+    Ring buffer of fixed-size time buckets with the aggregates of each field.
+
+    Buckets are updated incrementally as samples are added, with one column
+    (array) by aggregate and field, so memory is allocated once.
+    """
+
+    __slots__ = ("resolution", "_starts", "_counts", "_sums", "_mins", "_maxs")
+
+    def __init__(self, resolution: int, capacity: int):
+        """Initialize an empty rollup."""
+        self.resolution = resolution
+        self._starts = array("d", [math.nan]) * capacity
+        num_fields = len(TELEMETRY_FIELDS)
+        self._counts = [array("L", [0]) * capacity for _ in range(num_fields)]
+        self._sums = [array("d", [0.0]) * capacity for _ in range(num_fields)]
+        self._mins = [array("d", [0.0]) * capacity for _ in range(num_fields)]
+        self._maxs = [array("d", [0.0]) * capacity for _ in range(num_fields)]
+
+    @property
+    def nbytes(self) -> int:
+        """Return the size of the columns, in bytes."""
+        columns = [self._starts, *self._counts, *self._sums, *self._mins, *self._maxs]
+        return sum(column.itemsize * len(column) for column in columns)
+
+    def _index(self, start: float) -> int:
+        """Return the array index of the bucket starting at `start`."""
+        return int(start // self.resolution) % len(self._starts)
+
+    def covers(self, since: float, until: float) -> bool:
+        """Return True if the buckets from `since` to `until` are all kept."""
+        first = until - until % self.resolution
+        return since >= first - (len(self._starts) - 1) * self.resolution
+
+    def add(self, timestamp: float, values: Tuple[float, ...]):
+        """Add a sample to its bucket, reusing the slot of an expired bucket."""
+        start = timestamp - timestamp % self.resolution
+        idx = self._index(start)
+        if self._starts[idx] != start:
+            self._starts[idx] = start
+            for counts in self._counts:
+                counts[idx] = 0
+
+        for num, value in enumerate(values):
+            if math.isnan(value):
+                continue
+            count = self._counts[num][idx]
+            if count:
+                self._sums[num][idx] += value
+                self._mins[num][idx] = min(self._mins[num][idx], value)
+                self._maxs[num][idx] = max(self._maxs[num][idx], value)
+            else:
+                self._sums[num][idx] = value
+                self._mins[num][idx] = value
+                self._maxs[num][idx] = value
+            self._counts[num][idx] = count + 1
+
+    def aggregate(self, since: float, until: float) -> List[_Aggregate]:
+        """Aggregate the buckets overlapping the window from `since` to `until`."""
+        aggregates = _new_aggregates()
+        start = until - until % self.resolution
+        for _ in range(len(self._starts)):
+            if start + self.resolution <= since:
+                break
+            idx = self._index(start)
+            if self._starts[idx] == start:
+                for num, agg in enumerate(aggregates):
+                    count = self._counts[num][idx]
+                    if count:
+                        agg[0] += count
+                        agg[1] += self._sums[num][idx]
+                        agg[2] = min(agg[2], self._mins[num][idx])
+                        agg[3] = max(agg[3], self._maxs[num][idx])
+            start -= self.resolution
+        return aggregates
+
+
+class TelemetrySeries:
+    """
+    Raw samples and rollups of the light level and temperature of one device.
+
+    Raw samples are kept in a ring buffer of columns (timestamps and one
+    column by field, with NaN for missing values), and each sample is also
+    added to the 1 min, 15 min and 1 h rollups.
+    """
+
+    __slots__ = ("_times", "_columns", "_start", "_size", "_last_values", "rollups")
+
+    def __init__(self, capacity: int = SAMPLES_SIZE):
+        """Initialize an empty series."""
+        self._times = array("d", [0.0]) * capacity
+        self._columns = [array("d", [math.nan]) * capacity for _ in TELEMETRY_FIELDS]
+        self._start = 0
+        self._size = 0
+        self._last_values = None
+        self.rollups = [TelemetryRollup(*rollup) for rollup in ROLLUPS]
+
+    def __len__(self) -> int:
+        """Return the number of stored raw samples."""
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        """Return the size of the columns, in bytes."""
+        columns = [self._times, *self._columns]
+        return sum(column.itemsize * len(column) for column in columns) + sum(
+            rollup.nbytes for rollup in self.rollups
+        )
+
+    def _index(self, position: int) -> int:
+        """Return the array index of a position, 0 being the oldest."""
+        return (self._start + position) % len(self._times)
+
+    def record(self, timestamp: float, values: Tuple[Optional[float], ...]):
+        """Store a sample, if the values changed and it is not older than the last."""
+        # placeholders of missing values, like "No light level data", are None
+        values = tuple(
+            value
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+            else None
+            for value in values
+        )
+        if values == self._last_values or (
+            self._size and timestamp < self._times[self._index(self._size - 1)]
+        ):
+            return
+        self._last_values = values
+        values = tuple(math.nan if value is None else value for value in values)
+
+        capacity = len(self._times)
+        if self._size == capacity:
+            idx = self._start
+            self._start = (self._start + 1) % capacity
+        else:
+            idx = self._index(self._size)
+            self._size += 1
+        self._times[idx] = timestamp
+        for column, value in zip(self._columns, values):
+            column[idx] = value
+
+        for rollup in self.rollups:
+            rollup.add(timestamp, values)
+
+    def _aggregate_samples(self, since: float) -> List[_Aggregate]:
+        """Aggregate the raw samples from the `since` timestamp."""
+        # first position with a timestamp >= since
+        low, high = 0, self._size
+        while low < high:
+            mid = (low + high) // 2
+            if self._times[self._index(mid)] < since:
+                low = mid + 1
+            else:
+                high = mid
+
+        aggregates = _new_aggregates()
+        for position in range(low, self._size):
+            idx = self._index(position)
+            for column, agg in zip(self._columns, aggregates):
+                value = column[idx]
+                if not math.isnan(value):
+                    agg[0] += 1
+                    agg[1] += value
+                    agg[2] = min(agg[2], value)
+                    agg[3] = max(agg[3], value)
+        return aggregates
+
+    def summary(self, since: float, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Return the min, max and mean of each field from the `since` timestamp.
+
+        Raw samples are used if they cover the window, else the finest rollup
+        that covers it (or the coarsest one), with whole buckets. Without
+        samples in the window, the last values are returned, as they hold.
+        """
+        if now is None:
+            now = time()
+        if self._size < len(self._times) or self._times[self._start] <= since:
+            resolution = 0
+            aggregates = self._aggregate_samples(since)
+        else:
+            rollup = next(
+                (rollup for rollup in self.rollups if rollup.covers(since, now)),
+                self.rollups[-1],
+            )
+            resolution = rollup.resolution
+            aggregates = rollup.aggregate(since, now)
+
+        summary = _summarize(aggregates)
+        if self._last_values is not None:
+            for field, value in zip(TELEMETRY_FIELDS, self._last_values):
+                if summary[field] is None and value is not None:
+                    summary[field] = {
+                        "min": value,
+                        "max": value,
+                        "mean": value,
+                        "samples": 0,
+                    }
+        return {"resolution": resolution, **summary}
+
+
+class TelemetryStore:
+    """Telemetry series of all devices, with a fixed size for each one."""
+
+    def __init__(self):
+        """Initialize an empty store."""
+        self._series: Dict[str, TelemetrySeries] = {}
+
+    def __contains__(self, dev_id: str) -> bool:
+        """Return True if there are samples of a device."""
+        return dev_id in self._series
+
+    @property
+    def nbytes(self) -> int:
+        """Return the size of the stored columns, in bytes."""
+        return sum(series.nbytes for series in self._series.values())
+
+    def record(self, dev_id: str, data, timestamp: Optional[float] = None):
+        """Store a sample of the telemetry fields of a device record."""
+        series = self._series.get(dev_id)
+        if series is None:
+            series = self._series[dev_id] = TelemetrySeries()
+        series.record(
+            time() if timestamp is None else timestamp,
+            tuple(getattr(data, field) for field in TELEMETRY_FIELDS),
+        )
+
+    def summary(self, dev_id: str, minutes: float) -> Optional[Dict[str, Any]]:
+        """Return the summary of the last minutes of a device, if it has samples."""
+        series = self._series.get(dev_id)
+        if series is None:
+            return None
+        now = time()
+        return series.summary(now - 60 * minutes, now)
+
+    def forget(self, dev_id: str):
+        """Drop the samples of a device."""
+        self._series.pop(dev_id, None)
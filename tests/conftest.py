@@ -1,5 +1,7 @@
 """Pytest fixtures for huesensors tests."""
+import asyncio
 from copy import deepcopy
+from datetime import timedelta
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -12,6 +14,8 @@ from homeassistant.core import HomeAssistant
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 from homeassistant.util import slugify
 
+from custom_components.huesensor import DOMAIN
+from custom_components.huesensor.binary_sensor import async_setup_platform
 from custom_components.huesensor.data_manager import (
     BINARY_SENSOR_MODELS,
     HueSensorBaseDevice,
@@ -75,8 +79,27 @@ def add_sensor_data_to_bridge(bridge, sensor_key, raw_data):
     )
 
 
+def mock_coroutine_function(return_value=None, side_effect=None) -> MagicMock:
+    """
+    Mock a coroutine function, recording its calls like a MagicMock.
+
+    Calls return a coroutine with the result of `side_effect`, if given, or
+    the current `return_value` of the mock (`AsyncMock` needs Python 3.8).
+    """
+    mock = MagicMock(return_value=return_value)
+
+    async def _result(*args, **kwargs):
+        if side_effect is not None:
+            return side_effect(*args, **kwargs)
+        return mock.return_value
+
+    mock.side_effect = _result
+    return mock
+
+
 def _make_mock_bridge(idx_bridge, *sensors):
     bridge = MagicMock(spec=Bridge)
+    bridge.username = f"test-app-key-{idx_bridge}"
     bridge.sensors = {}
     for i, raw_data in enumerate(sensors):
         add_sensor_data_to_bridge(
@@ -96,6 +119,7 @@ def _mock_hue_bridges(bridges):
         sensor_manager.coordinator = coordinator
 
         hue_bridge = MagicMock(spec=HueBridge)
+        hue_bridge.host = f"192.168.1.{10 + i}"
         hue_bridge.api = bridge
         hue_bridge.sensor_manager = sensor_manager
 
@@ -104,6 +128,32 @@ def _mock_hue_bridges(bridges):
     return hue_bridges
 
 
+def mock_background_tasks(hass):
+    """Run HA tasks in the test loop, waiting for them in `async_block_till_done`."""
+    tasks = []
+
+    def _async_create_task(target):
+        task = asyncio.ensure_future(target)
+        tasks.append(task)
+        return task
+
+    async def _async_block_till_done():
+        while tasks:
+            await tasks.pop(0)
+
+    hass.async_create_task = _async_create_task
+    hass.async_block_till_done = _async_block_till_done
+
+
+@pytest.fixture(autouse=True)
+def mock_store():
+    """Mock the storage of the data manager snapshot, empty by default."""
+    with patch("custom_components.huesensor.data_manager.Store") as mock_store_cls:
+        store = mock_store_cls.return_value
+        store.async_load = mock_coroutine_function()
+        yield store
+
+
 @pytest.fixture
 def mock_hass():
     """Mock HA object for tests, including some sensors in hue integration."""
@@ -123,13 +173,41 @@ def mock_hass():
     }
     hass.config = MagicMock()
     hass.states = MagicMock()
+    hass.services = MagicMock()
+    hass.bus = MagicMock()
+    hass.loop = MagicMock()
+    mock_background_tasks(hass)
 
     return hass
 
 
-def patch_async_track_time_interval():
-    """Mock hass.async_track_time_interval for tests."""
+@pytest.fixture
+def setup_binary_sensors(mock_hass):
+    """
+    Set up the binary sensor platform with some extra config, without polling.
+
+    The setup returns the data manager and the entity of the first motion
+    sensor, already added to HA.
+    """
+
+    async def _setup(add_entities=None, **config):
+        config_bs = {"platform": DOMAIN, "scan_interval": timedelta(seconds=2)}
+        await async_setup_platform(
+            mock_hass, {**config_bs, **config}, add_entities or (lambda *_: None)
+        )
+        await mock_hass.async_block_till_done()
+        data_manager = mock_hass.data[DOMAIN]
+        bin_sensor = data_manager.registered_entities[DEV_ID_SENSOR_1]
+        await entity_test_added_to_hass(data_manager, bin_sensor)
+        return data_manager, bin_sensor
+
+    with patch_tick_scheduler():
+        yield _setup
+
+
+def patch_tick_scheduler():
+    """Mock the data manager tick scheduler for tests."""
     return patch(
-        "custom_components.huesensor.data_manager.async_track_time_interval",
+        "custom_components.huesensor.data_manager.TickScheduler",
         autospec=True,
     )
@@ -0,0 +1,236 @@
+"""
+Benchmarks of the integration with synthetic fleets of sensors.
+
+Skipped by default, run them with:
+    HUESENSOR_BENCHMARK=1 py.test tests/test_benchmark.py -s
+
+Results are compared with the baseline stored in `benchmark_baseline.json`,
+failing if tick latency or memory regress more than the tolerance
+(HUESENSOR_BENCHMARK_TOLERANCE, 0.25 by default). To store the results of a
+run as the new baseline, run it with HUESENSOR_BENCHMARK_SAVE=1.
+"""
+import json
+import os
+import random
+import tracemalloc
+from copy import deepcopy
+from datetime import timedelta
+from pathlib import Path
+from time import perf_counter
+from unittest.mock import MagicMock, patch
+
+import pytest
+from homeassistant.components.hue import DOMAIN as HUE_DOMAIN
+from homeassistant.core import HomeAssistant
+
+from custom_components.huesensor import DOMAIN
+from custom_components.huesensor.binary_sensor import async_setup_platform
+from custom_components.huesensor.data_manager import HueSensorBaseDevice
+from custom_components.huesensor.device_tracker import HueDeviceScanner
+
+from .conftest import (
+    MockAsyncCounter,
+    _make_mock_bridge,
+    _mock_hue_bridges,
+    entity_test_added_to_hass,
+    mock_background_tasks,
+    patch_tick_scheduler,
+)
+from .sensor_samples import (
+    MOCK_GEOFENCE,
+    MOCK_ZLLLightlevel,
+    MOCK_ZLLPresence,
+    MOCK_ZLLTemperature,
+)
+
+BASELINE_PATH = Path(__file__).parent / "benchmark_baseline.json"
+TOLERANCE = float(os.getenv("HUESENSOR_BENCHMARK_TOLERANCE", "0.25"))
+
+# Source files of the integration, to count its allocated memory blocks
+PACKAGE_FILES = str(
+    Path(__file__).parent.parent / "custom_components" / "huesensor" / "*"
+)
+
+# The device tracker scans once each 60 ticks (30 s / 0.5 s)
+TRACKER_TICKS_RATIO = 60
+
+# name: (bridges, SML sensors per bridge, geofences per bridge, change rate, ticks)
+SCENARIOS = {
+    "1x10_sml_idle": (1, 10, 2, 0, 2000),
+    "1x10_sml_busy": (1, 10, 2, 0.3, 2000),
+    "4x50_sml": (4, 50, 5, 0.05, 2000),
+    "8x200_sml": (8, 200, 10, 0.02, 1000),
+}
+
+pytestmark = pytest.mark.skipif(
+    not os.getenv("HUESENSOR_BENCHMARK"), reason="Set HUESENSOR_BENCHMARK=1 to run"
+)
+
+
+def _sml_resources(idx_bridge, idx_sensor):
+    """Raw data of the 3 resources of a SML sensor with a unique address."""
+    address = "00:17:88:01:{:02x}:{:02x}:{:02x}-02".format(
+        idx_bridge, idx_sensor // 256, idx_sensor % 256
+    )
+    resources = []
+    for sample, endpoint in (
+        (MOCK_ZLLPresence, "0406"),
+        (MOCK_ZLLLightlevel, "0400"),
+        (MOCK_ZLLTemperature, "0402"),
+    ):
+        raw = deepcopy(sample)
+        raw["uniqueid"] = f"{address}-{endpoint}"
+        raw["name"] = f"{sample['name']} {idx_bridge} {idx_sensor}"
+        resources.append(raw)
+    return resources
+
+
+def _geofence(idx_bridge, idx_sensor):
+    raw = deepcopy(MOCK_GEOFENCE)
+    raw["uniqueid"] = f"L_{idx_bridge:02}_{idx_sensor:05}"
+    raw["name"] = f"Phone {idx_bridge} {idx_sensor}"
+    return raw
+
+
+def _make_fleet_hass(bridges, sml, geofences):
+    """Mock HA with N bridges, each one with M SML sensors and some geofences."""
+    hass = MagicMock(spec=HomeAssistant)
+    hass.data = {
+        HUE_DOMAIN: _mock_hue_bridges(
+            [
+                _make_mock_bridge(
+                    idx_bridge,
+                    *(
+                        raw
+                        for idx_sensor in range(sml)
+                        for raw in _sml_resources(idx_bridge, idx_sensor)
+                    ),
+                    *(_geofence(idx_bridge, i) for i in range(geofences)),
+                )
+                for idx_bridge in range(bridges)
+            ]
+        )
+    }
+    hass.config = MagicMock()
+    hass.states = MagicMock()
+    hass.services = MagicMock()
+    hass.bus = MagicMock()
+    hass.loop = MagicMock()
+    mock_background_tasks(hass)
+    return hass
+
+
+def _apply_random_changes(hass, change_rate, tick, rnd):
+    """Change presence or light level of a fraction of the SML sensors."""
+    if not change_rate:
+        return
+    last_updated = "2020-02-06T{:02}:{:02}:{:02}".format(
+        tick // 3600 % 24, tick // 60 % 60, tick % 60
+    )
+    for hue_bridge in hass.data[HUE_DOMAIN].values():
+        for sensor in hue_bridge.api.sensors.values():
+            raw = sensor.raw
+            if raw["type"] == "ZLLPresence" and rnd.random() < change_rate:
+                raw["state"]["presence"] = not raw["state"]["presence"]
+                raw["state"]["lastupdated"] = last_updated
+            elif raw["type"] == "ZLLLightLevel" and rnd.random() < change_rate:
+                raw["state"]["lightlevel"] = rnd.randint(0, 30000)
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def _run_scenario(bridges, sml, geofences, change_rate, ticks):
+    hass = _make_fleet_hass(bridges, sml, geofences)
+    rnd = random.Random(42)
+    writes = MockAsyncCounter()
+
+    with patch_tick_scheduler(), patch.object(
+        HueSensorBaseDevice, "async_write_ha_state", lambda entity: writes()
+    ):
+        config = {"platform": DOMAIN, "scan_interval": timedelta(seconds=0.5)}
+        await async_setup_platform(hass, config, lambda *_: None)
+        await hass.async_block_till_done()
+        data_manager = hass.data[DOMAIN]
+        for entity in list(data_manager.registered_entities.values()):
+            await entity_test_added_to_hass(data_manager, entity)
+        assert len(data_manager.sensors) == bridges * sml
+
+        scanner = HueDeviceScanner(hass, MockAsyncCounter())
+        latencies = []
+        scanner_latencies = []
+
+        async def _tick(tick, timed=False):
+            # the synthetic changes are applied out of the timed update
+            _apply_random_changes(hass, change_rate, tick, rnd)
+            start = perf_counter()
+            await data_manager.async_update_from_bridges()
+            if timed:
+                latencies.append(perf_counter() - start)
+            if tick % TRACKER_TICKS_RATIO == 0:
+                start = perf_counter()
+                await scanner.async_update_info()
+                if timed:
+                    scanner_latencies.append(perf_counter() - start)
+
+        # warm-up, then timed ticks
+        for tick in range(10):
+            await _tick(tick)
+        for tick in range(ticks):
+            await _tick(tick, timed=True)
+
+        # memory of a second run of ticks, with the blocks still allocated
+        # by the integration at the end of it
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        snapshot_before = tracemalloc.take_snapshot()
+        for tick in range(ticks // 4):
+            await _tick(tick)
+        after, peak = tracemalloc.get_traced_memory()
+        snapshot_after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+    package_filter = [tracemalloc.Filter(True, PACKAGE_FILES)]
+    retained = snapshot_after.filter_traces(package_filter).compare_to(
+        snapshot_before.filter_traces(package_filter), "filename"
+    )
+    latencies.sort()
+    scanner_latencies.sort()
+    return {
+        "devices": len(data_manager.data),
+        "state_writes_per_tick": round(
+            writes.call_count / (ticks + ticks // 4 + 10), 2
+        ),
+        "p50_ms": round(_percentile(latencies, 0.5) * 1000, 4),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 4),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 4),
+        "max_ms": round(latencies[-1] * 1000, 4),
+        "scanner_p50_ms": round(_percentile(scanner_latencies, 0.5) * 1000, 4),
+        "scanner_max_ms": round(scanner_latencies[-1] * 1000, 4),
+        "retained_kib": round((after - before) / 1024, 1),
+        "peak_kib": round((peak - before) / 1024, 1),
+        "retained_blocks": sum(stat.count_diff for stat in retained),
+    }
+
+
+@pytest.mark.parametrize("scenario", SCENARIOS)
+async def test_benchmark_fleet(scenario):
+    """Run a benchmark scenario and compare it with the stored baseline."""
+    baseline = {}
+    if BASELINE_PATH.exists():
+        baseline = json.loads(BASELINE_PATH.read_text())
+    save = bool(os.getenv("HUESENSOR_BENCHMARK_SAVE"))
+    if not save and scenario not in baseline:
+        pytest.skip(f"No baseline stored for {scenario}")
+
+    result = await _run_scenario(*SCENARIOS[scenario])
+    print(f"\n{scenario}: {json.dumps(result)}")
+    if save:
+        baseline[scenario] = result
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True))
+        return
+
+    for key in ("p50_ms", "p95_ms", "peak_kib"):
+        limit = baseline[scenario][key] * (1 + TOLERANCE)
+        assert result[key] <= limit, f"{key} regressed: {result[key]} > {limit:.4f}"
@@ -1,13 +1,25 @@
 """Tests for binary_sensor.py."""
+import asyncio
+import json
 import logging
+import pstats
+from copy import deepcopy
 from datetime import timedelta
+from unittest.mock import MagicMock, patch
 
 import pytest
+from aiohue.sensors import GenericSensor
 from homeassistant.components.hue import DOMAIN as HUE_DOMAIN
 
 from custom_components.huesensor import DOMAIN
 from custom_components.huesensor.binary_sensor import async_setup_platform
-from custom_components.huesensor.data_manager import HueSensorData
+from custom_components.huesensor.data_manager import (
+    EVENT_PROFILE,
+    EVENT_TELEMETRY,
+    SERVICE_PROFILE,
+    SERVICE_QUERY_TELEMETRY,
+    HueSensorData,
+)
 from custom_components.huesensor.hue_api_response import (
     parse_hue_api_response,
     parse_sml,
@@ -17,7 +29,8 @@ from .conftest import (
     DEV_ID_SENSOR_1,
     add_sensor_data_to_bridge,
     entity_test_added_to_hass,
-    patch_async_track_time_interval,
+    mock_coroutine_function,
+    patch_tick_scheduler,
 )
 from .sensor_samples import (
     MOCK_ZLLLightlevel,
@@ -100,9 +113,10 @@ async def test_platform_binary_sensor_setup(mock_hass, caplog):
         entity_counter.append(1)
 
     with caplog.at_level(logging.DEBUG):
-        with patch_async_track_time_interval():
+        with patch_tick_scheduler():
             # setup binary sensor
             await async_setup_platform(mock_hass, config_bs, _add_entity_counter)
+            await mock_hass.async_block_till_done()
             assert sum(entity_counter) == 1
 
             assert DOMAIN in mock_hass.data
@@ -225,3 +239,592 @@ async def test_platform_binary_sensor_setup(mock_hass, caplog):
             assert data_coord_b2.async_request_refresh.call_count == 6
 
         assert len(caplog.messages) == 12
+
+
+async def test_bridges_refresh_concurrently(mock_hass, caplog):
+    """Test that a slow bridge does not block the update of the others."""
+    config_bs = {"platform": DOMAIN, "scan_interval": timedelta(seconds=2)}
+    slow_coordinator = mock_hass.data[HUE_DOMAIN][1].sensor_manager.coordinator
+    slow_coordinator.async_request_refresh = lambda: asyncio.sleep(5)
+
+    with patch_tick_scheduler(), patch(
+        "custom_components.huesensor.data_manager.BRIDGE_REFRESH_TIMEOUT", 0.05
+    ):
+        await async_setup_platform(mock_hass, config_bs, lambda *_: None)
+        await mock_hass.async_block_till_done()
+        data_manager = mock_hass.data[DOMAIN]
+        assert DEV_ID_SENSOR_1 in data_manager.registered_entities
+        assert "Timeout updating data from bridge 192.168.1.11" in caplog.text
+
+
+async def test_unchanged_sensors_are_not_parsed(mock_hass):
+    """Test that only raw sensors with changes are parsed in each update."""
+    config_bs = {"platform": DOMAIN, "scan_interval": timedelta(seconds=2)}
+    with patch_tick_scheduler():
+        await async_setup_platform(mock_hass, config_bs, lambda *_: None)
+        await mock_hass.async_block_till_done()
+        data_manager = mock_hass.data[DOMAIN]
+        bin_sensor = data_manager.registered_entities[DEV_ID_SENSOR_1]
+
+        with patch(
+            "custom_components.huesensor.data_manager.parse_sml",
+            wraps=parse_sml,
+        ) as mock_parse:
+            await data_manager.async_update_from_bridges()
+            assert mock_parse.call_count == 0
+
+            hue_bridge = mock_hass.data[HUE_DOMAIN][0].api
+            temp_data_st = hue_bridge.sensors["ZLLTemperature_0_2"].raw["state"]
+            temp_data_st["temperature"] = 1845
+            await data_manager.async_update_from_bridges()
+            assert mock_parse.call_count == 1
+            assert mock_parse.call_args[0][0]["type"] == "ZLLTemperature"
+            assert mock_parse.call_args[0][1] is data_manager.data[DEV_ID_SENSOR_1]
+            assert bin_sensor.device_state_attributes["temperature"] == 18.45
+            assert bin_sensor.device_state_attributes["battery"] == 58
+
+        # sensor ids reused by the bridge for other devices are indexed again
+        hue_bridge_2 = mock_hass.data[HUE_DOMAIN][1]
+        geofence = hue_bridge_2.api.sensors["Geofence_1_0"]
+        hue_bridge_2.api.sensors["Geofence_1_0"] = GenericSensor(
+            geofence.id, deepcopy(_NEW_ZLLPresence), None
+        )
+        await data_manager.async_update_from_bridges()
+        assert DEV_ID_NEW_SENSOR in data_manager.registered_entities
+        hue_bridge_2.api.sensors["Geofence_1_0"] = geofence
+
+        # the resource index follows sensors removed from bridges
+        assert len(data_manager._resource_index[hue_bridge_2.host]) == 1
+        hue_bridge_2.api.sensors.clear()
+        await data_manager.async_update_from_bridges()
+        assert not data_manager._resource_index[hue_bridge_2.host]
+
+
+async def test_adaptive_polling(mock_hass):
+    """Test that idle bridges are not polled on every tick."""
+    config_bs = {
+        "platform": DOMAIN,
+        "scan_interval": timedelta(seconds=2),
+        "max_scan_interval": timedelta(seconds=10),
+    }
+    data_coord_b1 = mock_hass.data[HUE_DOMAIN][0].sensor_manager.coordinator
+    with patch_tick_scheduler():
+        await async_setup_platform(mock_hass, config_bs, lambda *_: None)
+        await mock_hass.async_block_till_done()
+        data_manager = mock_hass.data[DOMAIN]
+        assert data_coord_b1.async_request_refresh.call_count == 1
+
+        await data_manager.async_update_from_bridges()
+        assert data_coord_b1.async_request_refresh.call_count == 2
+        await data_manager.async_update_from_bridges()
+        assert data_coord_b1.async_request_refresh.call_count == 2
+
+        backoff = data_manager._poll_backoffs[mock_hass.data[HUE_DOMAIN][0].host]
+        backoff.next_poll = 0
+        await data_manager.async_update_from_bridges()
+        assert data_coord_b1.async_request_refresh.call_count == 3
+
+
+async def test_throttled_state_writes(mock_hass, setup_binary_sensors):
+    """Test that only attribute changes are throttled by min_write_interval."""
+    data_manager, bin_sensor = await setup_binary_sensors(
+        min_write_interval=timedelta(seconds=60)
+    )
+
+    hue_bridge = mock_hass.data[HUE_DOMAIN][0].api
+    presence_st = hue_bridge.sensors["ZLLPresence_0_0"].raw["state"]
+    with patch.object(bin_sensor, "async_write_ha_state") as mock_write:
+        # motion is written right away
+        presence_st["presence"] = True
+        presence_st["lastupdated"] = "2020-02-06T07:29:08"
+        await data_manager.async_update_from_bridges()
+        assert mock_write.call_count == 1
+
+        # a new `last_updated` with the same state is delayed
+        presence_st["lastupdated"] = "2020-02-06T07:29:18"
+        await data_manager.async_update_from_bridges()
+        assert mock_write.call_count == 1
+        assert DEV_ID_SENSOR_1 in data_manager._pending_writes
+
+        # until the min interval has passed
+        data_manager._last_writes[DEV_ID_SENSOR_1] = (0, "on")
+        await data_manager.async_update_from_bridges()
+        assert mock_write.call_count == 2
+        assert not data_manager._pending_writes
+
+        # end of motion is written right away too
+        presence_st["presence"] = False
+        presence_st["lastupdated"] = "2020-02-06T07:29:28"
+        await data_manager.async_update_from_bridges()
+        assert mock_write.call_count == 3
+
+
+async def test_motion_history(mock_hass, setup_binary_sensors):
+    """Test the motion history of the sensors, and its query service."""
+    data_manager, bin_sensor = await setup_binary_sensors()
+    assert DEV_ID_SENSOR_1 not in data_manager.motion_history
+    assert "last_motion" not in bin_sensor.device_state_attributes
+
+    hue_bridge = mock_hass.data[HUE_DOMAIN][0].api
+    presence_st = hue_bridge.sensors["ZLLPresence_0_0"].raw["state"]
+    for minute, presence in ((29, True), (30, False), (31, True), (31, True)):
+        presence_st["presence"] = presence
+        presence_st["lastupdated"] = f"2020-02-06T07:{minute}:08"
+        await data_manager.async_update_from_bridges()
+
+    history = data_manager.motion_history[DEV_ID_SENSOR_1]
+    assert len(history) == 3
+    assert bin_sensor.device_state_attributes["last_motion"] == (
+        "2020-02-06T07:31:08+00:00"
+    )
+
+    result = data_manager.query_motion_history(DEV_ID_SENSOR_1, 60)
+    assert result["last_motion"] == "2020-02-06T07:31:08+00:00"
+    assert result["since_last_motion"] > 0
+    # the samples are from a long time ago
+    assert result["motion_count"] == 0
+    with patch(
+        "custom_components.huesensor.data_manager.time", return_value=1580974320
+    ):
+        assert (
+            data_manager.query_motion_history(DEV_ID_SENSOR_1, 2)["motion_count"] == 1
+        )
+        assert (
+            data_manager.query_motion_history(DEV_ID_SENSOR_1, 60)["motion_count"] == 2
+        )
+
+
+async def test_cached_state_attributes(mock_hass, setup_binary_sensors):
+    """Test that attributes are only rebuilt when shown fields change."""
+    data_manager, bin_sensor = await setup_binary_sensors()
+
+    attributes = bin_sensor.device_state_attributes
+    assert bin_sensor.device_state_attributes is attributes
+
+    hue_bridge = mock_hass.data[HUE_DOMAIN][0].api
+    raw_presence = hue_bridge.sensors["ZLLPresence_0_0"].raw
+    with patch.object(bin_sensor, "async_write_ha_state") as mock_write:
+        # changes in fields not shown by the entity are not written
+        raw_presence["config"]["ledindication"] = True
+        raw_presence["swversion"] = "6.1.1.28000"
+        await data_manager.async_update_from_bridges()
+        assert mock_write.call_count == 0
+        assert bin_sensor.device_state_attributes is attributes
+
+        raw_presence["config"]["sensitivity"] = 0
+        raw_presence["state"]["lastupdated"] = "2020-02-06T07:29:08"
+        await data_manager.async_update_from_bridges()
+        assert mock_write.call_count == 1
+        new_attributes = bin_sensor.device_state_attributes
+        assert new_attributes is not attributes
+        assert new_attributes["sensitivity"] == 0
+        assert attributes["sensitivity"] == 2
+
+
+async def test_missed_motion_pulse(mock_hass, setup_binary_sensors):
+    """Test the replay of motion pulses that happened between updates."""
+    data_manager, bin_sensor = await setup_binary_sensors(
+        missed_motion_hold=timedelta(seconds=5)
+    )
+    assert bin_sensor.state == "off"
+
+    hue_bridge = mock_hass.data[HUE_DOMAIN][0].api
+    raw_presence = hue_bridge.sensors["ZLLPresence_0_0"].raw
+    raw_light = hue_bridge.sensors["ZLLLightLevel_0_1"].raw
+    with patch.object(bin_sensor, "async_write_ha_state") as mock_write:
+        # presence went on and off since the last update
+        raw_presence["state"]["lastupdated"] = "2020-02-06T07:29:08"
+        await data_manager.async_update_from_bridges()
+        assert bin_sensor.state == "on"
+        assert mock_write.call_count == 1
+        delay, end_pulse, dev_id = mock_hass.loop.call_later.call_args[0]
+        assert delay == 5
+        assert data_manager.metrics.missed_pulses == 1
+
+        # other changes don't end the pulse
+        raw_light["state"]["lightlevel"] = 1000
+        await data_manager.async_update_from_bridges()
+        assert data_manager.data[DEV_ID_SENSOR_1].state == "on"
+        assert DEV_ID_SENSOR_1 in data_manager._missed_pulses
+
+        end_pulse(dev_id)
+        assert bin_sensor.state == "off"
+        assert mock_write.call_count == 2
+        assert len(data_manager.motion_history[DEV_ID_SENSOR_1]) == 2
+
+        # real motion cancels a replayed pulse
+        raw_presence["state"]["lastupdated"] = "2020-02-06T07:30:08"
+        await data_manager.async_update_from_bridges()
+        handle = mock_hass.loop.call_later.return_value
+        handle.cancel.reset_mock()
+        raw_presence["state"]["presence"] = True
+        raw_presence["state"]["lastupdated"] = "2020-02-06T07:30:10"
+        await data_manager.async_update_from_bridges()
+        handle.cancel.assert_called_once()
+        assert not data_manager._missed_pulses
+        assert bin_sensor.state == "on"
+
+
+async def test_snapshot_restore(mock_hass, mock_store):
+    """Test entities are restored from the stored snapshot before any refresh."""
+    config_bs = {"platform": DOMAIN, "scan_interval": timedelta(seconds=2)}
+    with patch_tick_scheduler():
+        await async_setup_platform(mock_hass, config_bs, lambda *_: None)
+        await mock_hass.async_block_till_done()
+    data_manager = mock_hass.data.pop(DOMAIN)
+    mock_store.async_delay_save.assert_called_once()
+    data_func, _delay = mock_store.async_delay_save.call_args[0]
+    snapshot = json.loads(json.dumps(data_func()))
+    assert set(snapshot["devices"]) == set(data_manager.registered_entities)
+
+    # HA restart
+    mock_store.async_load.return_value = snapshot
+    data_coord = mock_hass.data[HUE_DOMAIN][0].sensor_manager.coordinator
+    num_refreshes = data_coord.async_request_refresh.call_count
+    entities = []
+
+    def _add_entities(new_entities, update_before_add=False):
+        entities.extend(new_entities)
+
+    await async_setup_platform(mock_hass, config_bs, _add_entities)
+    data_manager = mock_hass.data[DOMAIN]
+    assert len(entities) == len(snapshot["devices"])
+    assert data_coord.async_request_refresh.call_count == num_refreshes
+    bin_sensor = data_manager.registered_entities[DEV_ID_SENSOR_1]
+    assert bin_sensor.state == "off"
+    assert bin_sensor.device_state_attributes["temperature"] == 17.44
+
+    # the bridges are refreshed in background, updating the added entities
+    hue_bridge = mock_hass.data[HUE_DOMAIN][0].api
+    presence_st = hue_bridge.sensors["ZLLPresence_0_0"].raw["state"]
+    presence_st["presence"] = True
+    presence_st["lastupdated"] = "2020-02-06T07:29:08"
+    data_manager.sensors[DEV_ID_SENSOR_1] = bin_sensor
+    with patch.object(bin_sensor, "async_write_ha_state") as mock_write:
+        await mock_hass.async_block_till_done()
+        assert mock_write.call_count == 1
+    assert data_coord.async_request_refresh.call_count == num_refreshes + 1
+    assert bin_sensor.state == "on"
+    assert len(entities) == len(snapshot["devices"])
+
+
+async def test_snapshot_restore_reconcile(mock_hass, mock_store):
+    """Test restored devices don't replay motion that happened while down."""
+    config_bs = {"platform": DOMAIN, "scan_interval": timedelta(seconds=2)}
+    with patch_tick_scheduler():
+        await async_setup_platform(mock_hass, config_bs, lambda *_: None)
+        await mock_hass.async_block_till_done()
+    data_manager = mock_hass.data.pop(DOMAIN)
+    data_func, _delay = mock_store.async_delay_save.call_args[0]
+    snapshot = json.loads(json.dumps(data_func()))
+    assert "state" not in snapshot["devices"][DEV_ID_SENSOR_1]
+
+    # snapshots with motion on are not restored as live motion
+    snapshot["devices"][DEV_ID_SENSOR_1].update(state="on", changed=True)
+    mock_store.async_load.return_value = snapshot
+    presence_st = mock_hass.data[HUE_DOMAIN][0].api.sensors["ZLLPresence_0_0"].raw
+    presence_st["state"]["lastupdated"] = "2020-02-06T07:45:08"
+    with patch_tick_scheduler():
+        await async_setup_platform(mock_hass, config_bs, lambda *_: None)
+        data_manager = mock_hass.data[DOMAIN]
+        bin_sensor = data_manager.registered_entities[DEV_ID_SENSOR_1]
+        assert bin_sensor.state == "off"
+
+        # the first refresh reconciles the restored data
+        await mock_hass.async_block_till_done()
+        assert bin_sensor.state == "off"
+        assert data_manager.metrics.missed_pulses == 0
+        assert DEV_ID_SENSOR_1 not in data_manager.motion_history
+
+        # and later updates replay missed pulses as usual
+        await entity_test_added_to_hass(data_manager, bin_sensor)
+        presence_st["state"]["lastupdated"] = "2020-02-06T07:46:08"
+        await data_manager.async_update_from_bridges()
+        assert bin_sensor.state == "on"
+        assert data_manager.metrics.missed_pulses == 1
+
+
+async def test_background_discovery(mock_hass):
+    """Test that setup returns before the bridges respond, retrying failures."""
+    config_bs = {"platform": DOMAIN, "scan_interval": timedelta(seconds=2)}
+    slow_coordinator = mock_hass.data[HUE_DOMAIN][0].sensor_manager.coordinator
+    bridge_response = asyncio.Event()
+    slow_coordinator.async_request_refresh = bridge_response.wait
+    entities = []
+
+    def _add_entities(new_entities, update_before_add=False):
+        entities.extend(new_entities)
+
+    with patch_tick_scheduler(), patch(
+        "custom_components.huesensor.data_manager.BRIDGE_REFRESH_TIMEOUT", 0.05
+    ), patch(
+        "custom_components.huesensor.data_manager.async_call_later"
+    ) as mock_call_later:
+        await asyncio.wait_for(
+            async_setup_platform(mock_hass, config_bs, _add_entities), 0.01
+        )
+        data_manager = mock_hass.data[DOMAIN]
+        assert not data_manager.registered_entities
+
+        # the bridge with the sensor times out, and it is retried later
+        await mock_hass.async_block_till_done()
+        assert not entities
+        _hass, _delay, retry = mock_call_later.call_args[0]
+
+        bridge_response.set()
+        retry(None)
+        await mock_hass.async_block_till_done()
+        assert len(entities) == 1
+        assert DEV_ID_SENSOR_1 in data_manager.registered_entities
+        assert data_manager._scan_interval == timedelta(seconds=2)
+
+
+async def test_discovery_retries_stop(mock_hass):
+    """Test discovery retries stop for removed bridges and once polling runs."""
+    config_bs = {"platform": DOMAIN, "scan_interval": timedelta(seconds=2)}
+    coordinator = mock_hass.data[HUE_DOMAIN][0].sensor_manager.coordinator
+    bridge_response = asyncio.Event()
+    coordinator.async_request_refresh = bridge_response.wait
+
+    with patch_tick_scheduler(), patch(
+        "custom_components.huesensor.data_manager.BRIDGE_REFRESH_TIMEOUT", 0.01
+    ), patch(
+        "custom_components.huesensor.data_manager.async_call_later"
+    ) as mock_call_later:
+        await async_setup_platform(mock_hass, config_bs, lambda *_: None)
+        await mock_hass.async_block_till_done()
+        data_manager = mock_hass.data[DOMAIN]
+        _hass, _delay, retry = mock_call_later.call_args[0]
+
+        # still failing, retried again
+        retry(None)
+        await mock_hass.async_block_till_done()
+        assert mock_call_later.call_count == 2
+
+        # not retried once the bridge is removed from the hue integration
+        bridge = mock_hass.data[HUE_DOMAIN].pop(0)
+        retry(None)
+        await mock_hass.async_block_till_done()
+        assert mock_call_later.call_count == 2
+
+        # nor once the regular updates are running
+        mock_hass.data[HUE_DOMAIN][0] = bridge
+        await data_manager.async_start_scheduler()
+        retry(None)
+        await mock_hass.async_block_till_done()
+        assert mock_call_later.call_count == 2
+        assert not data_manager.registered_entities
+
+
+async def test_vanished_devices(mock_hass, setup_binary_sensors):
+    """Test devices missing from the bridges go unavailable and are evicted."""
+    clock = [1000.0]
+    entities = []
+
+    def _add_entities(new_entities, update_before_add=False):
+        entities.extend(new_entities)
+
+    with patch("custom_components.huesensor.data_manager.monotonic", lambda: clock[0]):
+        data_manager, bin_sensor = await setup_binary_sensors(
+            _add_entities,
+            unavailable_after=timedelta(minutes=5),
+            evict_after=timedelta(hours=1),
+        )
+        assert bin_sensor.available
+
+        hue_bridge = mock_hass.data[HUE_DOMAIN][0].api
+        resources = dict(hue_bridge.sensors)
+        hue_bridge.sensors.clear()
+        with patch.object(bin_sensor, "async_write_ha_state") as mock_write:
+            await data_manager.async_update_from_bridges()
+            assert bin_sensor.available
+
+            clock[0] += 301
+            await data_manager.async_update_from_bridges()
+            assert not bin_sensor.available
+            assert mock_write.call_count == 1
+
+            # back in the bridge before the eviction
+            hue_bridge.sensors.update(resources)
+            await data_manager.async_update_from_bridges()
+            assert bin_sensor.available
+            assert mock_write.call_count == 2
+
+        # the device and its entity are removed after `evict_after`
+        hue_bridge.sensors.clear()
+        clock[0] += 3601
+        await data_manager.async_update_from_bridges()
+        assert DEV_ID_SENSOR_1 not in data_manager.data
+        assert DEV_ID_SENSOR_1 not in data_manager.registered_entities
+        assert not data_manager.sensors
+        assert not data_manager._fingerprints
+        assert not data_manager.unavailable_devices
+        mock_hass.states.async_remove.assert_called_once_with(
+            bin_sensor.entity_id, context=None
+        )
+        # the bridges are still polled, even with no entities left
+        assert data_manager.available
+        assert data_manager._tick_scheduler is not None
+
+        # state of bridges removed from the hue integration is dropped
+        removed_host = mock_hass.data[HUE_DOMAIN].pop(1).host
+        assert removed_host in data_manager._resource_index
+        clock[0] += 31
+        await data_manager.async_update_from_bridges()
+        assert removed_host not in data_manager._resource_index
+
+        # evicted devices are discovered again as new ones
+        hue_bridge.sensors.update(resources)
+        await data_manager.async_update_from_bridges()
+        assert len(entities) == 2
+        assert data_manager.registered_entities[DEV_ID_SENSOR_1] is entities[1]
+
+
+async def test_telemetry_store_service(mock_hass, setup_binary_sensors):
+    """Test light level and temperature samples, and their query service."""
+    data_manager, bin_sensor = await setup_binary_sensors()
+
+    hue_bridge = mock_hass.data[HUE_DOMAIN][0].api
+    light_st = hue_bridge.sensors["ZLLLightLevel_0_1"].raw["state"]
+    presence_st = hue_bridge.sensors["ZLLPresence_0_0"].raw["state"]
+    light_st["lightlevel"] = 10001
+    await data_manager.async_update_from_bridges()
+    # motion changes don't add samples
+    presence_st["presence"] = True
+    await data_manager.async_update_from_bridges()
+
+    handlers = {
+        call[0][1]: call[0][2]
+        for call in mock_hass.services.async_register.call_args_list
+    }
+    call = MagicMock(
+        data={"entity_id": [bin_sensor.entity_id, "binary_sensor.other"], "minutes": 5}
+    )
+    await handlers[SERVICE_QUERY_TELEMETRY](call)
+    event_type, event_data = mock_hass.bus.async_fire.call_args[0]
+    assert event_type == EVENT_TELEMETRY
+    summary = event_data["sensors"][bin_sensor.entity_id]
+    assert list(event_data["sensors"]) == [bin_sensor.entity_id]
+    assert summary["resolution"] == 0
+    assert summary["lx"] == {"min": 1.0, "max": 10.0, "mean": 5.5, "samples": 2}
+    assert summary["temperature"]["samples"] == 2
+    assert data_manager.metrics_snapshot()["telemetry_store_bytes"] > 0
+
+
+async def test_occupancy_groups(mock_hass, setup_binary_sensors):
+    """Test group occupancy is updated incrementally, writing only its flips."""
+    entities = []
+
+    def _add_entities(new_entities, update_before_add=False):
+        entities.extend(new_entities)
+
+    hue_bridge_2 = mock_hass.data[HUE_DOMAIN][1].api
+    add_sensor_data_to_bridge(hue_bridge_2, "ZLLPresence_1_0", _NEW_ZLLPresence)
+    data_manager, bin_sensor = await setup_binary_sensors(
+        _add_entities,
+        groups={
+            "living_room": [
+                "binary_sensor.test_living_room_motion_sensor",
+                "binary_sensor.test_kitchen_motion_sensor",
+            ]
+        },
+    )
+    group = entities[0]
+    assert group.unique_id == "huesensor_group_living_room"
+    assert group.name == "Living room"
+    assert group.device_class == "occupancy"
+    group.hass = mock_hass
+    await group.async_added_to_hass()
+
+    members = [bin_sensor, data_manager.registered_entities[DEV_ID_NEW_SENSOR]]
+    await entity_test_added_to_hass(data_manager, members[1])
+    assert group.device_state_attributes["entity_id"] == sorted(
+        entity.entity_id for entity in members
+    )
+    assert not group.is_on
+
+    presence_1 = mock_hass.data[HUE_DOMAIN][0].api.sensors["ZLLPresence_0_0"]
+    presence_2 = hue_bridge_2.sensors["ZLLPresence_1_0"]
+    with patch.object(group, "async_write_ha_state") as mock_group_write:
+        presence_1.raw["state"]["presence"] = True
+        await data_manager.async_update_from_bridges()
+        assert group.is_on
+        assert mock_group_write.call_count == 1
+
+        # other members and updates don't flip the group
+        presence_2.raw["state"]["presence"] = True
+        await data_manager.async_update_from_bridges()
+        presence_1.raw["state"]["presence"] = False
+        await data_manager.async_update_from_bridges()
+        assert group.is_on
+        assert mock_group_write.call_count == 1
+
+        presence_2.raw["state"]["presence"] = False
+        await data_manager.async_update_from_bridges()
+        assert not group.is_on
+        assert mock_group_write.call_count == 2
+
+        # removed members leave the group
+        presence_2.raw["state"]["presence"] = True
+        await data_manager.async_update_from_bridges()
+        assert mock_group_write.call_count == 3
+        await members[1].async_will_remove_from_hass()
+        assert not group.is_on
+        assert mock_group_write.call_count == 4
+
+
+async def test_profile_service(mock_hass, setup_binary_sensors, tmp_path):
+    """Test profiling the next update ticks, writing the profile to config dir."""
+    mock_hass.config = MagicMock()
+    mock_hass.config.path = lambda name: str(tmp_path / name)
+    mock_hass.async_add_executor_job = mock_coroutine_function(
+        side_effect=lambda f, *args: f(*args)
+    )
+    data_manager, _bin_sensor = await setup_binary_sensors()
+
+    handlers = {
+        call[0][1]: call[0][2]
+        for call in mock_hass.services.async_register.call_args_list
+    }
+    await handlers[SERVICE_PROFILE](MagicMock(data={"ticks": 2}))
+    for _ in range(3):
+        await data_manager.async_update_from_bridges()
+
+    event_type, event_data = mock_hass.bus.async_fire.call_args[0]
+    assert event_type == EVENT_PROFILE
+    assert event_data["ticks"] == 2
+    assert mock_hass.bus.async_fire.call_count == 1
+    assert pstats.Stats(event_data["path"]).total_calls > 0
+    with open(event_data["report"]) as report_file:
+        report = report_file.read()
+    assert report.startswith("Profile of 2 ticks")
+    assert "_iter_bridges_data" in report
+    assert "_flush_state_writes" in report
+    # the bridge refresh awaits are left out
+    assert "_async_refresh_bridge" not in report
+    assert data_manager._profiler is None
+
+    # other active profilers make the service fail, not the updates
+    with patch(
+        "custom_components.huesensor.data_manager.TickProfiler.check",
+        side_effect=ValueError("Another profiling tool is already active"),
+    ):
+        await handlers[SERVICE_PROFILE](MagicMock(data={"ticks": 2}))
+    assert data_manager._profiler is None
+
+
+async def test_missing_light_level(mock_hass, setup_binary_sensors):
+    """Test a null light level from the bridge doesn't break the updates."""
+    data_manager, bin_sensor = await setup_binary_sensors()
+
+    hue_bridge = mock_hass.data[HUE_DOMAIN][0].api
+    hue_bridge.sensors["ZLLLightLevel_0_1"].raw["state"]["lightlevel"] = None
+    hue_bridge.sensors["ZLLPresence_0_0"].raw["state"]["presence"] = True
+    with patch.object(bin_sensor, "async_write_ha_state") as mock_write:
+        await data_manager.async_update_from_bridges()
+        assert bin_sensor.state == "on"
+        assert mock_write.call_count == 1
+
+    summary = data_manager.telemetry.summary(DEV_ID_SENSOR_1, 10)
+    assert summary["light_level"]["samples"] == 1
+    assert summary["temperature"]["mean"] == 17.44
@@ -0,0 +1,133 @@
+"""Tests for bridge_client.py."""
+import asyncio
+from datetime import timedelta
+from unittest.mock import patch
+
+import aiohttp
+import pytest
+from aiohttp import web
+from homeassistant.components.hue import DOMAIN as HUE_DOMAIN
+
+from custom_components.huesensor import DOMAIN
+from custom_components.huesensor.binary_sensor import async_setup_platform
+from custom_components.huesensor.bridge_client import (
+    BridgeClientError,
+    HueSensorsClient,
+)
+
+from .conftest import DEV_ID_SENSOR_1, entity_test_added_to_hass, patch_tick_scheduler
+from .sensor_samples import MOCK_ZLLLightlevel, MOCK_ZLLPresence, MOCK_ZLLTemperature
+
+
+def _make_bridge_app(sensors, requests):
+    """Local stand-in of the sensors API of a bridge."""
+
+    async def _sensors(request):
+        requests.append(request)
+        if request.match_info["username"] != "test-app-key-0":
+            return web.json_response(
+                [{"error": {"type": 1, "description": "unauthorized user"}}]
+            )
+        if sensors.get("delay"):
+            await asyncio.sleep(sensors["delay"])
+        if sensors.get("body") is not None:
+            return web.Response(body=sensors["body"])
+        return web.json_response(sensors["data"])
+
+    app = web.Application()
+    app.router.add_get("/api/{username}/sensors", _sensors)
+    return app
+
+
+async def test_sensors_client(aiohttp_server):
+    """Test fetching the sensors of a local stand-in bridge."""
+    sensors = {"data": {"1": MOCK_ZLLPresence}}
+    requests = []
+    server = await aiohttp_server(_make_bridge_app(sensors, requests))
+    host = f"{server.host}:{server.port}"
+
+    async with aiohttp.ClientSession() as session:
+        client = HueSensorsClient(session, host, "test-app-key-0")
+        assert client.data_age is None
+        await client.async_refresh(1)
+        assert client.sensors == {"1": MOCK_ZLLPresence}
+        assert client.data_age >= 0
+
+        bad_client = HueSensorsClient(session, host, "bad-key")
+        with pytest.raises(BridgeClientError, match="unauthorized user"):
+            await bad_client.async_refresh(1)
+
+        sensors["body"] = b"<html>busy</html>"
+        with pytest.raises(BridgeClientError, match="invalid response"):
+            await client.async_refresh(1)
+        sensors["body"] = None
+
+        sensors["delay"] = 0.2
+        with pytest.raises(asyncio.TimeoutError):
+            await client.async_refresh(0.05)
+        assert client.sensors == {"1": MOCK_ZLLPresence}
+
+    assert len(requests) == 4
+
+
+async def test_direct_client_polling(mock_hass, aiohttp_server):
+    """Test polling the sensors with the direct client instead of aiohue."""
+    data = {
+        "5": MOCK_ZLLPresence,
+        "6": MOCK_ZLLLightlevel,
+        "7": MOCK_ZLLTemperature,
+    }
+    sensors = {"data": data}
+    requests = []
+    server = await aiohttp_server(_make_bridge_app(sensors, requests))
+    mock_hass.data[HUE_DOMAIN] = {0: mock_hass.data[HUE_DOMAIN][0]}
+    data_coord = mock_hass.data[HUE_DOMAIN][0].sensor_manager.coordinator
+    url = f"http://{server.host}:{server.port}/api/{{username}}/sensors"
+
+    config = {
+        "platform": DOMAIN,
+        "scan_interval": timedelta(seconds=2),
+        "direct_client": True,
+    }
+    async with aiohttp.ClientSession() as session:
+        with patch_tick_scheduler(), patch(
+            "custom_components.huesensor.bridge_client.SENSORS_URL", url
+        ), patch(
+            "custom_components.huesensor.data_manager.async_get_clientsession",
+            return_value=session,
+        ):
+            await async_setup_platform(mock_hass, config, lambda *_: None)
+            await mock_hass.async_block_till_done()
+            data_manager = mock_hass.data[DOMAIN]
+            bin_sensor = data_manager.registered_entities[DEV_ID_SENSOR_1]
+            await entity_test_added_to_hass(data_manager, bin_sensor)
+            assert bin_sensor.state == "off"
+
+            presence = {
+                **MOCK_ZLLPresence,
+                "state": {"presence": True, "lastupdated": "2020-02-06T07:29:08"},
+            }
+            sensors["data"] = {**data, "5": presence}
+            await data_manager.async_update_from_bridges()
+            assert bin_sensor.state == "on"
+
+            # the official integration is not refreshed
+            assert data_coord.async_request_refresh.call_count == 0
+            assert len(requests) == 2
+
+            # errors and timeouts keep the last data
+            sensors["delay"] = 0.1
+            with patch(
+                "custom_components.huesensor.data_manager.BRIDGE_REFRESH_TIMEOUT", 0.01
+            ):
+                await data_manager.async_update_from_bridges()
+            assert bin_sensor.state == "on"
+            assert data_manager.metrics.bridge_timeouts
+
+            # invalid responses don't abort the update
+            sensors["delay"] = 0
+            sensors["body"] = b"not json"
+            await data_manager.async_update_from_bridges()
+            assert bin_sensor.state == "on"
+
+            await bin_sensor.async_will_remove_from_hass()
@@ -0,0 +1,87 @@
+"""Tests for deadband.py."""
+from datetime import timedelta
+from unittest.mock import patch
+
+from homeassistant.components.hue import DOMAIN as HUE_DOMAIN
+
+from custom_components.huesensor import DOMAIN
+from custom_components.huesensor.binary_sensor import async_setup_platform
+from custom_components.huesensor.deadband import DeadbandFilter
+from custom_components.huesensor.hue_api_response import SMLState
+
+from .conftest import DEV_ID_SENSOR_1, entity_test_added_to_hass, patch_tick_scheduler
+
+
+def test_deadband_thresholds():
+    """Test that changes are published when they cross the threshold."""
+    record = SMLState()
+    record.temperature = 20.0
+    record.lx = 100.0
+    record.light_level = 20001
+    deadband = DeadbandFilter({"temperature": 0.2, "lx": 5})
+
+    parsed = {"temperature": 20.1}
+    assert not deadband.apply("dev", record, parsed)
+    assert parsed == {"temperature": 20.0}
+
+    parsed = {"lx": 103.0, "light_level": 20128, "dark": False}
+    assert not deadband.apply("dev", record, parsed)
+    assert parsed == {"lx": 100.0, "light_level": 20001, "dark": False}
+
+    parsed = {"temperature": 19.7, "lx": 94.0, "light_level": 19732}
+    assert not deadband.apply("dev", record, parsed)
+    assert parsed == {"temperature": 19.7, "lx": 94.0, "light_level": 19732}
+
+    # non numeric values are always published
+    parsed = {"temperature": "No temperature data"}
+    assert not deadband.apply("dev", record, parsed)
+    assert parsed == {"temperature": "No temperature data"}
+
+
+def test_deadband_min_interval():
+    """Test that changes are published at most once per interval."""
+    record = SMLState()
+    record.temperature = 20.0
+    deadband = DeadbandFilter({}, min_interval=60)
+
+    with patch("custom_components.huesensor.deadband.monotonic", return_value=1000):
+        parsed = {"temperature": 20.5}
+        assert not deadband.apply("dev", record, parsed)
+        assert parsed == {"temperature": 20.5}
+        record.temperature = 20.5
+
+        parsed = {"temperature": 21.0}
+        assert deadband.apply("dev", record, parsed)
+        assert parsed == {"temperature": 20.5}
+
+    with patch("custom_components.huesensor.deadband.monotonic", return_value=1060):
+        parsed = {"temperature": 21.0}
+        assert not deadband.apply("dev", record, parsed)
+        assert parsed == {"temperature": 21.0}
+
+
+async def test_deadband_state_writes(mock_hass):
+    """Test that small telemetry changes don't update the motion sensors."""
+    config_bs = {
+        "platform": DOMAIN,
+        "scan_interval": timedelta(seconds=2),
+        "deadband": {"temperature": 0.5},
+    }
+    with patch_tick_scheduler():
+        await async_setup_platform(mock_hass, config_bs, lambda *_: None)
+        await mock_hass.async_block_till_done()
+        data_manager = mock_hass.data[DOMAIN]
+        bin_sensor = data_manager.registered_entities[DEV_ID_SENSOR_1]
+        await entity_test_added_to_hass(data_manager, bin_sensor)
+
+        hue_bridge = mock_hass.data[HUE_DOMAIN][0].api
+        temp_state = hue_bridge.sensors["ZLLTemperature_0_2"].raw["state"]
+        with patch.object(bin_sensor, "async_write_ha_state") as mock_write:
+            temp_state["temperature"] = 1780
+            await data_manager.async_update_from_bridges()
+            assert mock_write.call_count == 0
+            assert bin_sensor.device_state_attributes["temperature"] == 17.44
+
+            temp_state["temperature"] = 1800
+            await data_manager.async_update_from_bridges()
+            assert bin_sensor.device_state_attributes["temperature"] == 18.0
@@ -2,13 +2,17 @@
 from datetime import timedelta
 from unittest.mock import MagicMock, patch
 
+from homeassistant.components.hue import DOMAIN as HUE_DOMAIN
+from homeassistant.components.zone import ENTITY_ID_HOME
+from homeassistant.core import State
+
 from custom_components.huesensor import DOMAIN
 from custom_components.huesensor.device_tracker import (
     HueDeviceScanner,
     async_setup_scanner,
 )
 
-from .conftest import MockAsyncCounter
+from .conftest import MockAsyncCounter, mock_coroutine_function
 
 
 async def test_device_tracker_setup(mock_hass):
@@ -41,3 +45,55 @@ async def test_device_scanner(mock_hass):
     scanner = HueDeviceScanner(mock_hass, mock_async_see)
     await scanner.async_update_info()
     assert mock_async_see.call_count == 1
+
+    # unchanged geofences are not seen again
+    await scanner.async_update_info()
+    assert mock_async_see.call_count == 1
+
+    geofence = mock_hass.data[HUE_DOMAIN][1].api.sensors["Geofence_1_0"]
+    geofence.raw["state"]["presence"] = True
+    await scanner.async_update_info()
+    assert mock_async_see.call_count == 2
+
+    geofence.raw["state"]["lastupdated"] = "2019-04-09T06:35:00"
+    await scanner.async_update_info()
+    assert mock_async_see.call_count == 3
+
+
+async def test_home_zone_gps(mock_hass):
+    """Test that geofences at home use the tracked home zone coordinates."""
+    mock_hass.states.get.return_value = State(
+        ENTITY_ID_HOME, "zoning", {"latitude": 40.0, "longitude": -3.0}
+    )
+    mock_async_see = mock_coroutine_function()
+    scanner = HueDeviceScanner(mock_hass, mock_async_see)
+    with patch(
+        "custom_components.huesensor.device_tracker.async_track_state_change"
+    ) as mock_track_state, patch(
+        "custom_components.huesensor.device_tracker.async_track_time_interval"
+    ):
+        await scanner.async_start(mock_hass, timedelta(seconds=30))
+    _hass, entity_id, on_home_change = mock_track_state.call_args[0]
+    assert entity_id == ENTITY_ID_HOME
+
+    geofence = mock_hass.data[HUE_DOMAIN][1].api.sensors["Geofence_1_0"]
+    geofence.raw["state"]["presence"] = True
+    await scanner.async_update_info()
+    assert mock_async_see.call_args[1]["gps"] == [40.0, -3.0]
+
+    # zone edits are used without looking up the state machine
+    mock_hass.states.get.reset_mock()
+    on_home_change(
+        ENTITY_ID_HOME,
+        None,
+        State(ENTITY_ID_HOME, "zoning", {"latitude": 41.0, "longitude": -4.0}),
+    )
+    geofence.raw["state"]["lastupdated"] = "2019-04-09T06:35:00"
+    await scanner.async_update_info()
+    assert mock_async_see.call_args[1]["gps"] == [41.0, -4.0]
+    mock_hass.states.get.assert_not_called()
+
+    on_home_change(ENTITY_ID_HOME, None, None)
+    geofence.raw["state"]["lastupdated"] = "2019-04-09T06:45:00"
+    await scanner.async_update_info()
+    assert "gps" not in mock_async_see.call_args[1]
@@ -0,0 +1,165 @@
+"""Tests for event_stream.py."""
+import asyncio
+import json
+from datetime import timedelta
+from unittest.mock import patch
+
+import aiohttp
+from aiohttp import web
+from homeassistant.components.hue import DOMAIN as HUE_DOMAIN
+
+from custom_components.huesensor import DOMAIN
+from custom_components.huesensor.binary_sensor import async_setup_platform
+from custom_components.huesensor.event_stream import (
+    HueEventStream,
+    update_raw_from_event,
+)
+
+from .conftest import (
+    DEV_ID_SENSOR_1,
+    entity_test_added_to_hass,
+    patch_tick_scheduler,
+)
+from .sensor_samples import MOCK_ZLLLightlevel, MOCK_ZLLPresence, MOCK_ZLLTemperature
+
+
+def _event(*resources, creationtime="2020-02-06T07:29:10Z"):
+    """Build an SSE message as sent by the bridge."""
+    container = {
+        "creationtime": creationtime,
+        "data": list(resources),
+        "id": "9f0b8ae5-3f5d-4a3a-a8bb-ec36a3a4c3b3",
+        "type": "update",
+    }
+    return f"id: 1581000000:0\ndata: {json.dumps([container])}\n\n".encode()
+
+
+async def _wait_for(condition, timeout=2.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return True
+        await asyncio.sleep(0.01)
+    return False
+
+
+def test_update_raw_from_event():
+    """Test conversion of API v2 resources into API v1 raw sensor data."""
+    raw = json.loads(json.dumps(MOCK_ZLLPresence))
+    motion = {
+        "id_v1": "/sensors/5",
+        "type": "motion",
+        "motion": {"motion": True, "motion_valid": True},
+        "creationtime": "2020-02-06T07:29:08Z",
+    }
+    assert update_raw_from_event(raw, motion)
+    assert raw["state"] == {"presence": True, "lastupdated": "2020-02-06T07:29:08"}
+    assert not update_raw_from_event(raw, motion)
+
+    raw = json.loads(json.dumps(MOCK_ZLLLightlevel))
+    light = {
+        "id_v1": "/sensors/6",
+        "type": "light_level",
+        "light": {"light_level": 23500},
+    }
+    assert update_raw_from_event(raw, light)
+    assert raw["state"]["lightlevel"] == 23500
+    assert raw["state"]["daylight"] and not raw["state"]["dark"]
+    assert raw["state"]["lastupdated"] == MOCK_ZLLLightlevel["state"]["lastupdated"]
+
+    raw = json.loads(json.dumps(MOCK_ZLLTemperature))
+    temp = {
+        "id_v1": "/sensors/7",
+        "type": "temperature",
+        "temperature": {"temperature": 18.5},
+    }
+    assert update_raw_from_event(raw, temp)
+    assert raw["state"]["temperature"] == 1850
+
+
+async def test_event_stream_updates(mock_hass, aiohttp_server):
+    """Test push updates from a local stand-in of the bridge event stream."""
+    connections = []
+
+    async def _eventstream(request):
+        assert request.headers["hue-application-key"]
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await response.write(b": hi\n\n")
+        connections.append(response)
+        await asyncio.sleep(10)
+        return response
+
+    app = web.Application()
+    app.router.add_get("/eventstream/clip/v2", _eventstream)
+    server = await aiohttp_server(app)
+    url = str(server.make_url("/eventstream/clip/v2"))
+
+    data_coord_b1 = mock_hass.data[HUE_DOMAIN][0].sensor_manager.coordinator
+    config = {"platform": DOMAIN, "scan_interval": timedelta(seconds=2)}
+    async with aiohttp.ClientSession() as session:
+        with patch_tick_scheduler(), patch(
+            "custom_components.huesensor.data_manager.EVENT_STREAM_URL", url
+        ), patch(
+            "custom_components.huesensor.data_manager.async_get_clientsession",
+            return_value=session,
+        ):
+            config["event_stream"] = True
+            await async_setup_platform(mock_hass, config, lambda *_: None)
+            await mock_hass.async_block_till_done()
+            data_manager = mock_hass.data[DOMAIN]
+            bin_sensor = data_manager.registered_entities[DEV_ID_SENSOR_1]
+            await entity_test_added_to_hass(data_manager, bin_sensor)
+            assert await _wait_for(lambda: len(connections) == 2)
+            assert bin_sensor.state == "off"
+
+            # pushed motion is applied without polling the bridge
+            motion = {
+                "id_v1": "/sensors/ZLLPresence_0_0",
+                "type": "motion",
+                "motion": {"motion": True, "motion_valid": True},
+            }
+            for connection in connections:
+                await connection.write(_event(motion))
+            assert await _wait_for(lambda: bin_sensor.state == "on")
+            assert data_coord_b1.async_request_refresh.call_count == 1
+
+            # polling is skipped while the streams are connected
+            await data_manager.async_update_from_bridges()
+            assert data_coord_b1.async_request_refresh.call_count == 1
+
+            # and restarts as fallback when they are not
+            for stream in data_manager._event_streams.values():
+                await stream.async_stop()
+            await data_manager.async_update_from_bridges()
+            assert data_coord_b1.async_request_refresh.call_count == 2
+
+            await bin_sensor.async_will_remove_from_hass()
+
+
+async def test_event_stream_errors(caplog):
+    """Test unexpected errors don't stop the stream or leave it connected."""
+    events = []
+
+    async def _on_events(resources):
+        events.append(resources)
+        raise TypeError("bad data")
+
+    stream = HueEventStream(None, "https://bridge/eventstream", "key", _on_events)
+    motion = {"id_v1": "/sensors/5", "type": "motion", "motion": {"motion": True}}
+    await stream._dispatch(json.dumps([{"type": "update", "data": [motion]}]))
+    assert len(events) == 1
+    assert "Error processing events" in caplog.text
+
+    async def _listen():
+        stream.connected = True
+        raise RuntimeError("unexpected")
+
+    with patch.object(stream, "_listen", _listen):
+        stream.start()
+        await asyncio.sleep(0)
+        assert not stream.connected
+        assert not stream.streaming
+        assert "Unexpected error in event stream" in caplog.text
+        # it keeps reconnecting
+        assert not stream._task.done()
+        await stream.async_stop()
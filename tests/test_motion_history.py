@@ -0,0 +1,39 @@
+"""Tests for motion_history.py."""
+from custom_components.huesensor.motion_history import (
+    MotionHistory,
+    bridge_timestamp,
+)
+
+
+def test_bridge_timestamp():
+    """Test the conversion of the `last_updated` of the bridge."""
+    assert bridge_timestamp(["2020-02-06", "07:28:08"]) == 1580974088
+    assert bridge_timestamp(["none"]) > 1580974088
+
+
+def test_motion_history_window_queries():
+    """Test motion counts in time windows, before and after wrapping around."""
+    history = MotionHistory(capacity=8)
+    assert len(history) == 0
+    assert history.count_since(0) == 0
+    assert history.last_motion is None
+
+    for i in range(3):
+        history.record(100 + 10 * i, True)
+        history.record(105 + 10 * i, False)
+    assert len(history) == 6
+    assert history.last_motion == 120
+    assert history.count_since(0) == 3
+    assert history.count_since(110) == 2
+    assert history.count_since(111) == 1
+    assert history.count_since(121) == 0
+
+    # the oldest transitions are dropped when full
+    for i in range(3, 6):
+        history.record(100 + 10 * i, True)
+        history.record(105 + 10 * i, False)
+    assert len(history) == 8
+    assert history.last_motion == 150
+    assert history.count_since(0) == 4
+    assert history.count_since(130) == 3
+    assert history.count_since(155) == 0
@@ -0,0 +1,39 @@
+"""Tests for refresh_broker.py."""
+import asyncio
+from datetime import timedelta
+
+from homeassistant.components.hue import DOMAIN as HUE_DOMAIN
+
+from custom_components.huesensor.refresh_broker import async_get_refresh_broker
+
+
+async def test_refresh_broker(mock_hass):
+    """Test coalescing of refresh requests and max-age reuse of bridge data."""
+    hue_bridge = mock_hass.data[HUE_DOMAIN][0]
+    data_coord = hue_bridge.sensor_manager.coordinator
+    broker = async_get_refresh_broker(mock_hass, hue_bridge)
+    assert async_get_refresh_broker(mock_hass, hue_bridge) is broker
+    assert broker.data_age is None
+
+    # concurrent requests share the same bridge refresh
+    await asyncio.gather(*(broker.async_refresh() for _ in range(3)))
+    assert data_coord.async_request_refresh.call_count == 1
+    assert broker.data_age is not None
+
+    # fresh enough data is reused
+    await broker.async_refresh(timedelta(seconds=5))
+    assert data_coord.async_request_refresh.call_count == 1
+
+    # but not if it is older than requested
+    await broker.async_refresh()
+    assert data_coord.async_request_refresh.call_count == 2
+
+    # a waiter timing out does not cancel the shared refresh
+    data_coord.async_request_refresh = lambda: asyncio.sleep(0.05)
+    other_waiter = asyncio.ensure_future(broker.async_refresh())
+    try:
+        await asyncio.wait_for(broker.async_refresh(), 0.01)
+    except asyncio.TimeoutError:
+        pass
+    await other_waiter
+    assert broker.data_age < 0.05
@@ -0,0 +1,73 @@
+"""Tests for scheduler.py."""
+import asyncio
+import time
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+from custom_components.huesensor.scheduler import AdaptivePollBackoff, TickScheduler
+
+
+def test_adaptive_poll_backoff():
+    """Test polling backoff while idle and snap back on activity."""
+    clock = [1000.0]
+    with patch(
+        "custom_components.huesensor.scheduler.monotonic", side_effect=lambda: clock[0]
+    ):
+        backoff = AdaptivePollBackoff(timedelta(seconds=0.5), timedelta(seconds=4))
+        assert backoff.is_due()
+
+        # fast polling while active and during the cooldown after it
+        backoff.record_poll(active=True)
+        clock[0] += 30
+        backoff.record_poll(active=False)
+        assert backoff.interval == 0.5
+
+        # exponential backoff when idle, bounded by the max interval
+        clock[0] += 31
+        intervals = []
+        for _ in range(6):
+            backoff.record_poll(active=False)
+            intervals.append(backoff.interval)
+        assert intervals == [1, 2, 4, 4, 4, 4]
+        assert not backoff.is_due()
+        clock[0] += 3.75
+        assert backoff.is_due()
+
+        # first detection snaps back to the fastest rate
+        backoff.record_poll(active=True)
+        assert backoff.interval == 0.5
+        assert not backoff.is_due()
+        clock[0] += 0.25
+        assert backoff.is_due()
+
+
+async def test_tick_scheduler():
+    """Test precise ticks without overlapping updates."""
+    hass = MagicMock()
+    hass.loop = asyncio.get_event_loop()
+    hass.async_create_task = hass.loop.create_task
+    running = []
+    max_running = []
+
+    async def _slow_update():
+        running.append(1)
+        max_running.append(len(running))
+        await asyncio.sleep(0.03)
+        running.pop()
+
+    scheduler = TickScheduler(hass, timedelta(seconds=0.01), _slow_update)
+    scheduler.start()
+    await asyncio.sleep(0.1)
+
+    # a blocked loop skips the missed ticks instead of bursting them
+    time.sleep(0.05)
+    await asyncio.sleep(0.02)
+    scheduler.stop()
+    await asyncio.sleep(0.04)
+
+    assert max(max_running) == 1
+    assert scheduler.ticks >= 2
+    assert scheduler.overruns >= 2
+    assert scheduler.missed_ticks >= 3
+    assert scheduler.stats["max_lateness"] >= 0.04
+    assert not running
@@ -0,0 +1,169 @@
+"""Tests for sensor.py."""
+from datetime import timedelta
+from unittest.mock import patch
+
+from homeassistant.components.hue import DOMAIN as HUE_DOMAIN
+
+from custom_components.huesensor import DOMAIN
+from custom_components.huesensor.binary_sensor import (
+    async_setup_platform as async_setup_binary_sensors,
+)
+from custom_components.huesensor.data_manager import EVENT_METRICS, SERVICE_GET_METRICS
+from custom_components.huesensor.sensor import async_setup_platform
+
+from .conftest import DEV_ID_SENSOR_1, entity_test_added_to_hass, patch_tick_scheduler
+
+
+async def test_diagnostic_sensors(mock_hass):
+    """Test performance metrics in diagnostic sensors and service."""
+    entities = []
+
+    def _add_entities(new_entities, update_before_add=False):
+        entities.extend(new_entities)
+
+    await async_setup_platform(mock_hass, {"platform": DOMAIN}, _add_entities)
+    assert not entities
+
+    with patch_tick_scheduler():
+        await async_setup_binary_sensors(
+            mock_hass,
+            {"platform": DOMAIN, "scan_interval": timedelta(seconds=2)},
+            lambda *_: None,
+        )
+        await mock_hass.async_block_till_done()
+        data_manager = mock_hass.data[DOMAIN]
+        for _ in range(3):
+            await data_manager.async_update_from_bridges()
+
+    config = {"platform": DOMAIN, "diagnostics": True}
+    await async_setup_platform(mock_hass, config, _add_entities)
+    assert len(entities) == 5
+    metrics = {entity.unique_id: entity for entity in entities}
+    for entity in entities:
+        await entity.async_update()
+
+    refresh_sensor = metrics["huesensor_metric_bridge_refresh"]
+    assert refresh_sensor.unit_of_measurement == "ms"
+    assert refresh_sensor.state >= 0
+    assert len(refresh_sensor.device_state_attributes) == 2
+    assert metrics["huesensor_metric_parse_time"].state >= 0
+    assert metrics["huesensor_metric_devices_changed"].state == 0.2
+    assert metrics["huesensor_metric_state_writes"].state == 0
+    assert metrics["huesensor_metric_scheduler_overruns"].state is None
+
+    # metrics service
+    handlers = {
+        call[0][1]: call[0][2]
+        for call in mock_hass.services.async_register.call_args_list
+    }
+    await handlers[SERVICE_GET_METRICS](None)
+    event_type, snapshot = mock_hass.bus.async_fire.call_args[0]
+    assert event_type == EVENT_METRICS
+    assert snapshot["devices_changed"]["count"] == 5
+
+
+async def test_telemetry_sensors(mock_hass, setup_binary_sensors):
+    """Test light level and temperature sensors, updated apart from motion."""
+    entities = []
+
+    def _add_entities(new_entities, update_before_add=False):
+        entities.extend(new_entities)
+
+    data_manager, bin_sensor = await setup_binary_sensors()
+    with patch(
+        "custom_components.huesensor.sensor.async_track_time_interval"
+    ) as mock_track_time:
+        assert "temperature" in bin_sensor.device_state_attributes
+
+        config = {
+            "platform": DOMAIN,
+            "telemetry": True,
+            "scan_interval": timedelta(seconds=60),
+        }
+        await async_setup_platform(mock_hass, config, _add_entities)
+        await mock_hass.async_block_till_done()
+        _hass, update_telemetry, interval = mock_track_time.call_args[0]
+        assert interval == timedelta(seconds=60)
+
+    sensors = {entity.unique_id: entity for entity in entities}
+    light_sensor = sensors[f"{DEV_ID_SENSOR_1}_light_level"]
+    temp_sensor = sensors[f"{DEV_ID_SENSOR_1}_temperature"]
+    assert len(sensors) == 2
+    assert light_sensor.name == "Living room motion sensor light level"
+    assert light_sensor.state == 1.0
+    assert light_sensor.device_class == "illuminance"
+    assert "dark" in light_sensor.device_state_attributes
+    assert temp_sensor.state == 17.44
+    assert temp_sensor.unit_of_measurement == "°C"
+    assert "temperature" not in bin_sensor.device_state_attributes
+    assert DEV_ID_SENSOR_1 in data_manager._pending_writes
+
+    hue_bridge = mock_hass.data[HUE_DOMAIN][0].api
+    data_coord = mock_hass.data[HUE_DOMAIN][0].sensor_manager.coordinator
+    for entity in entities:
+        entity.hass = mock_hass
+        await entity.async_added_to_hass()
+    with patch.object(bin_sensor, "async_write_ha_state") as mock_write, patch.object(
+        light_sensor, "async_write_ha_state"
+    ) as mock_light_write, patch.object(
+        temp_sensor, "async_write_ha_state"
+    ) as mock_temp_write:
+        # the motion entity is written once without the telemetry attributes
+        await data_manager.async_update_from_bridges()
+        assert mock_write.call_count == 1
+
+        # light level changes are not parsed by motion updates
+        hue_bridge.sensors["ZLLLightLevel_0_1"].raw["state"]["lightlevel"] = 10001
+        await data_manager.async_update_from_bridges()
+        assert mock_write.call_count == 1
+        assert light_sensor.state == 1.0
+        num_refreshes = data_coord.async_request_refresh.call_count
+
+        # but by the telemetry update, reusing the fresh bridge data
+        await update_telemetry()
+        assert data_coord.async_request_refresh.call_count == num_refreshes
+        assert light_sensor.state == 10.0
+        assert mock_light_write.call_count == 1
+        assert mock_temp_write.call_count == 0
+        assert mock_write.call_count == 1
+
+        # availability changes of the device are written
+        hue_bridge.sensors.clear()
+        data_manager.unavailable_devices.add(DEV_ID_SENSOR_1)
+        await update_telemetry()
+        assert not light_sensor.available
+        assert mock_light_write.call_count == 2
+        assert mock_temp_write.call_count == 1
+
+    # sensors of evicted devices are removed
+    data_manager._forget_device(DEV_ID_SENSOR_1)
+    await update_telemetry()
+    assert mock_hass.states.async_remove.call_count == 2
+
+
+async def test_telemetry_before_binary_sensors(mock_hass):
+    """Test motion sensors are discovered after a first telemetry update."""
+    with patch_tick_scheduler(), patch(
+        "custom_components.huesensor.sensor.async_track_time_interval"
+    ):
+        await async_setup_platform(
+            mock_hass, {"platform": DOMAIN, "telemetry": True}, lambda *_: None
+        )
+        await mock_hass.async_block_till_done()
+        data_manager = mock_hass.data[DOMAIN]
+        assert DEV_ID_SENSOR_1 in data_manager.data
+
+        entities = []
+        await async_setup_binary_sensors(
+            mock_hass,
+            {"platform": DOMAIN, "scan_interval": timedelta(seconds=2)},
+            lambda new_entities, *_: entities.extend(new_entities),
+        )
+        await mock_hass.async_block_till_done()
+        assert list(data_manager.registered_entities) == [DEV_ID_SENSOR_1]
+        assert entities == [data_manager.registered_entities[DEV_ID_SENSOR_1]]
+
+        bin_sensor = entities[0]
+        await entity_test_added_to_hass(data_manager, bin_sensor)
+        await data_manager.async_update_from_bridges()
+        assert len(data_manager.registered_entities) == 1
@@ -0,0 +1,90 @@
+"""Tests for telemetry_store.py."""
+from types import SimpleNamespace
+
+from custom_components.huesensor.telemetry_store import (
+    TelemetrySeries,
+    TelemetryStore,
+)
+
+T0 = 1580972400  # 2020-02-06 07:00:00 UTC
+
+
+def test_telemetry_series_raw_samples():
+    """Test window stats of raw samples, skipping repeated values."""
+    series = TelemetrySeries(capacity=8)
+    assert series.summary(T0, T0)["lx"] is None
+
+    for i, lx in enumerate((10, 20, 20, 30, 60)):
+        series.record(T0 + 60 * i, (10000 + i, lx, 20.0 if i < 3 else None))
+    # samples older than the last one are dropped
+    series.record(T0, (1, 1, 1))
+    assert len(series) == 5
+
+    summary = series.summary(T0, T0 + 300)
+    assert summary["resolution"] == 0
+    assert summary["lx"] == {"min": 10, "max": 60, "mean": 28.0, "samples": 5}
+    assert summary["temperature"]["samples"] == 3
+    assert series.summary(T0 + 180, T0 + 300)["lx"]["mean"] == 45.0
+
+    # without samples in the window, the last values hold
+    summary = series.summary(T0 + 600, T0 + 600)
+    assert summary["lx"] == {"min": 60, "max": 60, "mean": 60, "samples": 0}
+    assert summary["temperature"] is None
+
+
+def test_telemetry_series_rollups():
+    """Test the rollups used for windows older than the raw samples."""
+    series = TelemetrySeries(capacity=4)
+    nbytes = series.nbytes
+    # one sample every 5 minutes for 3 hours
+    for i in range(36):
+        series.record(T0 + 300 * i, (i, i, 20.0))
+    now = T0 + 300 * 35
+    assert len(series) == 4
+    assert series.nbytes == nbytes
+
+    # 1 min buckets for the last 2 hours
+    summary = series.summary(now - 3600, now)
+    assert summary["resolution"] == 60
+    assert summary["lx"] == {"min": 23, "max": 35, "mean": 29.0, "samples": 13}
+
+    # 15 min buckets, with whole buckets at the start of the window
+    summary = series.summary(now - 3 * 3600 + 60, now)
+    assert summary["resolution"] == 900
+    assert summary["lx"]["samples"] == 36
+    assert summary["lx"]["min"] == 0
+
+    # the 1 min buckets are overwritten after 2 hours
+    later = now + 2 * 3600
+    series.record(later, (0, 0, 19.0))
+    assert series.summary(later - 3600, later)["lx"]["samples"] == 1
+
+
+def test_telemetry_store():
+    """Test the store of all devices."""
+    store = TelemetryStore()
+    assert store.summary("SML_1", 10) is None
+    record = SimpleNamespace(light_level=10000, lx=10.0, temperature=21.5)
+    store.record("SML_1", record)
+    assert "SML_1" in store
+    assert store.summary("SML_1", 10)["temperature"]["mean"] == 21.5
+    assert store.nbytes > 0
+
+    store.forget("SML_1")
+    assert "SML_1" not in store
+    assert store.nbytes == 0
+
+
+def test_telemetry_series_missing_values():
+    """Test placeholders of missing values are stored as missing."""
+    series = TelemetrySeries(capacity=8)
+    series.record(T0, ("No light level data", None, "No temperature data"))
+    series.record(T0 + 60, (10000, 10.0, "No temperature data"))
+    assert len(series) == 2
+
+    summary = series.summary(T0, T0 + 60)
+    assert summary["light_level"]["samples"] == 1
+    assert summary["temperature"] is None
+    summary = series.summary(T0 + 600, T0 + 600)
+    assert summary["lx"]["mean"] == 10.0
+    assert summary["temperature"] is None